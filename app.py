@@ -1,35 +1,53 @@
+import json
 import os
-import tempfile
 
 import streamlit as st
 import pandas as pd
-import joblib
 import plotly.express as px
 
 # Local imports
-from src.data_preprocessing import load_chat, clean_chat
-from src.predict import predict_chat
-from src.Labelling import auto_label
-from src.analysis import (
-    chat_stats,
-    generate_wordcloud,
-    messages_over_time,
-    avg_message_length,
-    top_words,
-    emoji_usage,
-)
+from src.data_preprocessing import CHAT_COLUMNS, clean_chat
+from src.pipeline import ChatPipeline
+from src.cache import ResultCache, content_key
+from src.feedback import FeedbackUpdater, record_feedback
+from src.incremental import analyze_chat
+from src import instrumentation
+from src.predict import MODEL_REGISTRY
+from src.analysis import ChatProfile, profile_wordcloud
 
 # -------------------------------
-# Load Model + Vectorizer
+# Load Model (process-wide registry, hot-reloads new bundles)
 # -------------------------------
+scorer, scorer_version = MODEL_REGISTRY.get_versioned()
+
+
+@st.cache_resource
+def get_result_cache():
+    """Process-wide LRU cache of parsed/scored uploads and their analytics."""
+    return ResultCache(max_entries=8)
+
+
+result_cache = get_result_cache()
+
+
 @st.cache_resource
-def load_model():
-    model = joblib.load("models/spam_model.pkl")
-    vectorizer = joblib.load("models/vectorizer.pkl")
-    return model, vectorizer
+def get_feedback_updater():
+    """Background thread folding reviewer corrections into the model (one per process)."""
+    updater = FeedbackUpdater()
+    updater.start()
+    return updater
 
 
-model, vectorizer = load_model()
+feedback_updater = get_feedback_updater()
+
+TOP_WORDS_CHOICES = [10, 15, 20, 30]
+
+
+def plotly_chart(fig, name):
+    """st.plotly_chart with an instrumentation span around serialization + render."""
+    with instrumentation.span(f"app.plotly.{name}"):
+        st.plotly_chart(fig, width="stretch")
+
 
 # -------------------------------
 # Page Config
@@ -864,18 +882,46 @@ with st.sidebar:
     st.markdown("---")
     st.markdown("### Upload chat")
     uploaded_file = st.file_uploader(
-        "Choose WhatsApp .txt file",
-        type=["txt"],
+        "Choose WhatsApp .txt or .zip export",
+        type=["txt", "zip"],
         help="Upload exported WhatsApp chat",
     )
 
+    remember_chat = st.checkbox(
+        "Remember chat for re-exports",
+        value=False,
+        key="remember_chat",
+        help="Keep this chat's results on disk so a later export of it only "
+        "processes the new messages",
+    )
+
+    group_near_duplicates = st.checkbox(
+        "Group near-duplicate messages",
+        value=False,
+        key="near_duplicates",
+        disabled=remember_chat,
+        help="Cluster copies of the same message template (spam campaigns) and "
+        "classify each cluster once. Not available for remembered chats",
+    )
+
     if uploaded_file:
-        uploaded_file.seek(0)
-        file_size_mb = len(uploaded_file.read()) / (1024 * 1024)
-        uploaded_file.seek(0)
+        file_size_mb = uploaded_file.size / (1024 * 1024)
         st.success(f"Loaded {uploaded_file.name}")
         st.caption(f"Size: {file_size_mb:.2f} MB")
 
+    st.markdown("---")
+    show_performance = st.checkbox(
+        "Performance panel",
+        value=instrumentation.enabled_by_env(),
+        key="performance_panel",
+        help="Time every stage (parsing, scoring, charts, exports). Timings are "
+             "collected for the whole app process, all sessions included.",
+    )
+    if show_performance:
+        # Collection is process-wide: once on, it stays on for every session,
+        # so one session closing its panel cannot cut another one's totals short
+        instrumentation.enable()
+
 
 # -------------------------------
 # MAIN TITLE
@@ -902,7 +948,7 @@ if uploaded_file is None:
         """
     <div class="welcome-card">
         <div class="welcome-kicker">No chat selected</div>
-        <div class="welcome-title">Upload a WhatsApp .txt export</div>
+        <div class="welcome-title">Upload a WhatsApp .txt or .zip export</div>
         <div class="welcome-text">
             Use the sidebar upload control to begin the scan.
         </div>
@@ -912,20 +958,54 @@ if uploaded_file is None:
     )
 
 else:
-    temp_file_path = None
-
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".txt") as temp_file:
-            temp_file.write(uploaded_file.getbuffer())
-            temp_file_path = temp_file.name
-        file_path = temp_file_path
+        # Hash and parse the upload's in-memory buffer directly (no temp file)
+        with uploaded_file.getbuffer() as upload_view:
+            upload_key = content_key(upload_view, scorer_version)
+        if remember_chat:
+            upload_key += ":remember"  # so ticking the box saves an already-seen upload
+        elif group_near_duplicates:
+            upload_key += ":near-duplicates"
+
+        def run_pipeline():
+            instrumentation.count("uploads_processed")
+            if remember_chat:
+                # Only the messages added since the last export are processed
+                outcome = analyze_chat(
+                    uploaded_file, scorer=scorer, model_version=scorer_version
+                )
+                return {
+                    "results": outcome["results"],
+                    "timings": outcome["timings"],
+                    "profile": outcome["profile"],
+                    "incremental": {
+                        key: outcome[key] for key in ("mode", "reason", "new_messages")
+                    },
+                }
+            pipeline = ChatPipeline(scorer, parse_workers=os.cpu_count(),
+                                    near_duplicates=group_near_duplicates)
+            pipeline.run(uploaded_file)
+            return {"results": pipeline.results, "timings": pipeline.timings}
 
         # -------------------------------
-        # LOAD + CLEAN CHAT
+        # PARSE + LABEL + SCORE (once per upload)
         # -------------------------------
-        with st.spinner("Processing chat..."):
-            df = load_chat(file_path)
-            df = df[df["message"].apply(lambda x: isinstance(x, str) and x.strip() != "")]
+        with st.spinner("Processing chat..."), instrumentation.span(
+            "app.upload", bytes=uploaded_file.size
+        ) as upload_span:
+            upload_entry = result_cache.get_or_compute(upload_key, run_pipeline)
+            upload_span.set(messages=len(upload_entry["results"]))
+            results = upload_entry["results"]
+            df = results
+
+        def cached(name, compute):
+            """Memoize an analytics output on this upload's cache entry."""
+            if name not in upload_entry:
+                with instrumentation.span(f"app.compute.{name}"):
+                    upload_entry[name] = compute()
+            else:
+                instrumentation.count("analytics_cache_hits")
+            return upload_entry[name]
 
         # -------------------------------
         # CHAT OVERVIEW
@@ -938,7 +1018,7 @@ else:
 
         with col1:
             st.dataframe(
-                style_table(df.head(8), theme_mode),
+                style_table(df[CHAT_COLUMNS].head(8), theme_mode),
                 width="stretch",
                 hide_index=True,
             )
@@ -947,6 +1027,21 @@ else:
             st.metric("Messages", len(df))
             if "sender" in df.columns:
                 st.metric("Participants", df["sender"].nunique())
+        st.caption(
+            " | ".join(
+                f"{stage}: {seconds * 1000:.0f} ms"
+                for stage, seconds in upload_entry["timings"].items()
+            )
+        )
+        if "incremental" in upload_entry:
+            incremental = upload_entry["incremental"]
+            if incremental["mode"] == "full":
+                st.caption(f"Full analysis ({incremental['reason']}); saved for re-exports")
+            else:
+                st.caption(
+                    f"Re-export: {incremental['new_messages']} new messages processed, "
+                    "earlier history reused"
+                )
         st.markdown("<hr class='section-separator'>", unsafe_allow_html=True)
 
         # -------------------------------
@@ -957,16 +1052,6 @@ else:
             unsafe_allow_html=True,
         )
 
-        with st.spinner("Detecting spam..."):
-            results = predict_chat(file_path)
-            results = auto_label(results)
-            results["final_prediction"] = results.apply(
-                lambda row: "Spam"
-                if row["prediction"] == "Spam" or row["auto_spam"]
-                else "Ham",
-                axis=1,
-            )
-
         total_msgs = len(results)
         spam_msgs = (results["final_prediction"] == "Spam").sum()
         ham_msgs = total_msgs - spam_msgs
@@ -1031,7 +1116,7 @@ else:
             )
             fig_pie.update_layout(**plot_layout, height=350, title_x=0.5)
             fig_pie.update_traces(textfont=dict(color=plot_font_color))
-            st.plotly_chart(fig_pie, width="stretch")
+            plotly_chart(fig_pie, "spam_share")
 
         with col2:
             if "sender" in results.columns and results["sender"].nunique() > 1:
@@ -1054,7 +1139,41 @@ else:
                     color_discrete_sequence=["#2dd4bf"],
                 )
                 fig_bar.update_layout(**plot_layout, height=350, title_x=0.5)
-                st.plotly_chart(fig_bar, width="stretch")
+                plotly_chart(fig_bar, "spam_by_sender")
+
+        # -------------------------------
+        # SPAM CAMPAIGNS (near-duplicate clusters)
+        # -------------------------------
+        if "cluster_size" in results.columns:
+            spam_clusters = results[
+                (results["final_prediction"] == "Spam") & (results["cluster_size"] > 1)
+            ]
+            campaigns = (
+                spam_clusters.groupby("cluster_id")
+                .agg(
+                    Messages=("cluster_size", "first"),
+                    Senders=("sender", "nunique"),
+                    Example=("message", "first"),
+                )
+                .sort_values("Messages", ascending=False)
+                .head(10)
+            )
+            st.markdown(
+                "<div class='section-header'>Spam Campaigns</div>",
+                unsafe_allow_html=True,
+            )
+            if campaigns.empty:
+                st.caption("No repeated spam templates found.")
+            else:
+                st.dataframe(
+                    style_table(campaigns[["Messages", "Senders", "Example"]], theme_mode),
+                    width="stretch",
+                    hide_index=True,
+                )
+                st.caption(
+                    f"{len(results)} messages fall into "
+                    f"{results['cluster_id'].nunique()} near-duplicate clusters"
+                )
         st.markdown("<hr class='section-separator'>", unsafe_allow_html=True)
 
         # -------------------------------
@@ -1107,7 +1226,50 @@ else:
             theme_mode,
             prediction_col="final_prediction",
         )
-        st.dataframe(styled_df, width="stretch", hide_index=True)
+        table = st.dataframe(
+            styled_df,
+            width="stretch",
+            hide_index=True,
+            on_select="rerun",
+            selection_mode="multi-row",
+            key=f"detailed_table:{upload_key}:{filter_type}:{show_count}",
+        )
+
+        # Reviewer corrections: logged for the background model updater
+        selected = filtered_results.iloc[table.selection.rows]
+        if len(selected):
+            # The keyword rule marks its hits Spam whatever the model says,
+            # so a Ham correction for them could never change the result
+            rule_spam = selected["auto_spam"].astype(bool)
+            hammable = selected[~rule_spam]
+            col1, col2, _ = st.columns([1, 1, 3])
+            with col1:
+                mark_spam = st.button(f"Mark {len(selected)} as Spam", key="mark_spam")
+            with col2:
+                mark_ham = st.button(
+                    f"Mark {len(hammable)} as Ham", key="mark_ham", disabled=hammable.empty
+                )
+            if rule_spam.any():
+                st.caption(
+                    f"{int(rule_spam.sum())} selected message(s) contain a spam keyword. "
+                    "The keyword rule marks them Spam whatever the model learns, "
+                    "so they cannot be marked as Ham."
+                )
+            if mark_spam or mark_ham:
+                marked = selected if mark_spam else hammable
+                saved = record_feedback(
+                    marked["message"],
+                    [1 if mark_spam else 0] * len(marked),
+                    model_version=scorer_version,
+                )
+                st.success(
+                    f"Saved {saved} correction(s). The model is updated in the "
+                    "background within a minute, and later runs use it."
+                )
+        else:
+            st.caption("Select misclassified rows to mark them as spam or ham.")
+        if feedback_updater.last_error is not None:
+            st.caption(f"Model updates from corrections are paused: {feedback_updater.last_error}")
         st.markdown("<hr class='section-separator'>", unsafe_allow_html=True)
 
         # -------------------------------
@@ -1118,10 +1280,11 @@ else:
             unsafe_allow_html=True,
         )
 
-        chat_df = clean_chat(df)
+        # One pass over the chat feeds every chart and export below
+        profile = cached("profile", lambda: ChatProfile.from_frame(clean_chat(df)))
 
         # Basic stats
-        total_msgs_ana, participants, active_senders = chat_stats(chat_df)
+        total_msgs_ana, participants, active_senders = profile.chat_stats()
         col1, col2 = st.columns(2)
         with col1:
             st.metric("Total Messages", total_msgs_ana)
@@ -1141,21 +1304,25 @@ else:
                 color_discrete_sequence=["#2dd4bf"],
             )
             fig_active.update_layout(**plot_layout, height=350, title_x=0.5)
-            st.plotly_chart(fig_active, width="stretch")
+            plotly_chart(fig_active, "active_senders")
         st.markdown("<hr class='section-separator'>", unsafe_allow_html=True)
 
         # Word Cloud
-        wc = generate_wordcloud(chat_df)
-        if wc:
+        def render_wordcloud():
+            wc = profile_wordcloud(profile)
+            return wc.to_array() if wc else None
+
+        wc_image = cached("wordcloud", render_wordcloud)
+        if wc_image is not None:
             st.markdown(
                 "<div class='section-header'>Word Cloud</div>",
                 unsafe_allow_html=True,
             )
-            st.image(wc.to_array(), caption="Word Cloud", width="stretch")
+            st.image(wc_image, caption="Word Cloud", width="stretch")
             st.markdown("<hr class='section-separator'>", unsafe_allow_html=True)
 
         # Messages over time
-        daily_msgs = messages_over_time(chat_df)
+        daily_msgs = profile.messages_over_time()
         if daily_msgs is not None and not daily_msgs.empty:
             st.markdown(
                 "<div class='section-header'>Messages Over Time</div>",
@@ -1177,7 +1344,7 @@ else:
             )
             fig_time.update_traces(mode="lines+markers")
             fig_time.update_layout(**plot_layout, height=400, title_x=0.5)
-            st.plotly_chart(fig_time, width="stretch")
+            plotly_chart(fig_time, "messages_over_time")
 
             show_time_table = st.checkbox(
                 "Show Messages Table", value=False, key="time_table"
@@ -1188,7 +1355,7 @@ else:
         st.markdown("<hr class='section-separator'>", unsafe_allow_html=True)
 
         # Average message length
-        avg_len = avg_message_length(chat_df)
+        avg_len = profile.avg_message_length()
         if avg_len is not None and not avg_len.empty:
             st.markdown(
                 "<div class='section-header'>Average Message Length</div>",
@@ -1209,7 +1376,7 @@ else:
                 color_discrete_sequence=["#38bdf8"],
             )
             fig_avg.update_layout(**plot_layout, height=400, title_x=0.5)
-            st.plotly_chart(fig_avg, width="stretch")
+            plotly_chart(fig_avg, "avg_message_length")
 
             show_avg_table = st.checkbox(
                 "Show Avg Length Table", value=False, key="avglen_table"
@@ -1226,11 +1393,11 @@ else:
         )
         show_count_words = st.radio(
             "Show Top Words",
-            [10, 15, 20, 30],
+            TOP_WORDS_CHOICES,
             index=1,
             horizontal=True,
         )
-        top_words_list = top_words(chat_df, n=show_count_words)
+        top_words_list = profile.top_words(show_count_words)
         top_words_df = pd.DataFrame(top_words_list, columns=["Word", "Count"])
 
         fig_words = px.bar(
@@ -1261,7 +1428,7 @@ else:
             )
         )
 
-        st.plotly_chart(fig_words, width="stretch")
+        plotly_chart(fig_words, "top_words")
 
         show_words_table = st.checkbox(
             "Show Top Words Table", value=False, key="words_table"
@@ -1272,7 +1439,7 @@ else:
         st.markdown("<hr class='section-separator'>", unsafe_allow_html=True)
 
         # Emoji usage
-        emoji_counts = emoji_usage(chat_df)
+        emoji_counts = profile.emoji_usage()
         if emoji_counts:
             st.markdown(
                 "<div class='section-header'>Top Emojis</div>",
@@ -1299,7 +1466,9 @@ else:
         full_csv_name = f"{uploaded_file.name.split('.')[0]}_full.csv"
         analysis_csv_name = f"{uploaded_file.name.split('.')[0]}_analysis.csv"
 
-        full_csv = results.to_csv(index=False).encode("utf-8")
+        with instrumentation.span("app.export.predictions_csv", messages=len(results)) as export_span:
+            full_csv = results.to_csv(index=False).encode("utf-8")
+            export_span.set(bytes=len(full_csv))
 
         summary_data = {
             "Metric": [
@@ -1323,7 +1492,7 @@ else:
         active_senders_df.columns = ["Sender", "Message Count"]
 
         daily_msgs_df = (
-            messages_over_time(chat_df).reset_index()
+            daily_msgs.reset_index()
             if daily_msgs is not None and not daily_msgs.empty
             else pd.DataFrame(columns=["Date", "Messages"])
         )
@@ -1331,7 +1500,7 @@ else:
             daily_msgs_df.columns = ["Date", "Messages"]
 
         avg_len_df_export = (
-            avg_message_length(chat_df).reset_index()
+            avg_len.reset_index()
             if avg_len is not None and not avg_len.empty
             else pd.DataFrame(columns=["Sender", "Avg Message Length"])
         )
@@ -1339,7 +1508,7 @@ else:
             avg_len_df_export.columns = ["Sender", "Avg Message Length"]
 
         top_words_df_export = pd.DataFrame(
-            top_words(chat_df, n=show_count_words), columns=["Word", "Count"]
+            top_words_list, columns=["Word", "Count"]
         )
 
         emoji_df = (
@@ -1350,20 +1519,21 @@ else:
 
         from io import StringIO
 
-        output = StringIO()
-        summary_df.to_csv(output, index=False)
-        output.write("\n\nActive Senders\n")
-        active_senders_df.to_csv(output, index=False)
-        output.write("\n\nMessages Over Time\n")
-        daily_msgs_df.to_csv(output, index=False)
-        output.write("\n\nAverage Message Length\n")
-        avg_len_df_export.to_csv(output, index=False)
-        output.write("\n\nTop Words\n")
-        top_words_df_export.to_csv(output, index=False)
-        output.write("\n\nEmoji Usage\n")
-        emoji_df.to_csv(output, index=False)
-
-        analysis_csv = output.getvalue().encode("utf-8")
+        with instrumentation.span("app.export.analysis_csv") as export_span:
+            output = StringIO()
+            summary_df.to_csv(output, index=False)
+            output.write("\n\nActive Senders\n")
+            active_senders_df.to_csv(output, index=False)
+            output.write("\n\nMessages Over Time\n")
+            daily_msgs_df.to_csv(output, index=False)
+            output.write("\n\nAverage Message Length\n")
+            avg_len_df_export.to_csv(output, index=False)
+            output.write("\n\nTop Words\n")
+            top_words_df_export.to_csv(output, index=False)
+            output.write("\n\nEmoji Usage\n")
+            emoji_df.to_csv(output, index=False)
+            analysis_csv = output.getvalue().encode("utf-8")
+            export_span.set(bytes=len(analysis_csv))
 
         col1, col2 = st.columns(2)
         with col1:
@@ -1388,9 +1558,52 @@ else:
 
     except Exception as e:
         st.error(f"Processing error: {str(e)}")
-    finally:
-        if temp_file_path and os.path.exists(temp_file_path):
-            os.remove(temp_file_path)
+
+# -------------------------------
+# PERFORMANCE PANEL (optional)
+# -------------------------------
+if show_performance:
+    perf = instrumentation.snapshot()
+    st.markdown("<div class='section-header'>Performance</div>", unsafe_allow_html=True)
+    st.caption("Process-wide totals: every session of this app process adds to them.")
+    if perf["stages"]:
+        perf_df = pd.DataFrame(
+            [
+                {
+                    "Stage": name,
+                    "Runs": stage["calls"],
+                    "Total ms": round(stage["seconds"] * 1000, 1),
+                    "Avg ms": round(stage["seconds"] * 1000 / stage["calls"], 1),
+                    "Messages": stage["messages"],
+                    "MB": round(stage["bytes"] / (1024 * 1024), 2),
+                }
+                for name, stage in perf["stages"].items()
+            ]
+        ).sort_values("Total ms", ascending=False)
+        st.dataframe(style_table(perf_df, theme_mode), width="stretch", hide_index=True)
+        if perf["counters"]:
+            st.caption(" | ".join(f"{k}: {v}" for k, v in sorted(perf["counters"].items())))
+
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button(
+                label="Download span log (JSON lines)",
+                data="".join(
+                    json.dumps(record, ensure_ascii=False) + "\n"
+                    for record in perf["records"]
+                ),
+                file_name="spam_detector_spans.jsonl",
+                mime="application/json",
+            )
+        with col2:
+            st.download_button(
+                label="Download Prometheus metrics",
+                data=instrumentation.prometheus_text(),
+                file_name="spam_detector.prom",
+                mime="text/plain",
+            )
+    else:
+        st.caption("No stages recorded yet. Upload a chat to populate the panel.")
 
 # Footer
 st.markdown(
@@ -0,0 +1,205 @@
+# ================================
+# Benchmark Suite
+# ================================
+# python -m benchmarks.run --sizes 1000 100000 --output bench.json
+# python -m benchmarks.run --save-baseline            # record benchmarks/baseline.json
+# python -m benchmarks.run --threshold 0.25           # exit 1 on a >25% regression
+#
+# Every stage runs on a deterministic synthetic chat (benchmarks.synthetic_chat).
+# Reported per stage: best wall time, messages/s and peak Python memory
+# (tracemalloc, measured in a separate run so it does not skew the timings).
+
+import argparse
+import gc
+import json
+import os
+import platform
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.synthetic_chat import add_generator_args, generator_kwargs, write_chat
+from src.data_preprocessing import clean_chat, load_chat
+from src.inference import clean_texts
+from src.Labelling import SPAM_KEYWORDS, auto_label
+from src.predict import get_model, predict_chat
+from src import analysis
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# Stages faster than this are too noisy to fail a run on
+MIN_COMPARABLE_SECONDS = 0.005
+
+# auto_label before token-boundary matching: one boundary-free str.contains
+LEGACY_SPAM_PATTERN = "|".join(re.escape(k) for k in SPAM_KEYWORDS)
+
+
+def legacy_auto_label(df):
+    """Reference point for the auto_label stage (no keyword ids, no boundaries)."""
+    df["auto_spam"] = df["message"].str.contains(LEGACY_SPAM_PATTERN, case=False, na=False)
+    df["auto_spam_label"] = df["auto_spam"].map({True: "Spam", False: "Ham"})
+    return df
+
+
+def _stages(path, df, chat_df):
+    """(name, callable) pairs; each callable does one full run of the stage."""
+    return [
+        ("load_chat", lambda: load_chat(path)),
+        ("auto_label", lambda: auto_label(df.copy())),
+        ("auto_label_legacy", lambda: legacy_auto_label(df.copy())),
+        ("predict_chat", lambda: predict_chat(path)),
+        ("predict_chat_near_duplicates", lambda: predict_chat(path, near_duplicates=True)),
+        ("chat_stats", lambda: analysis.chat_stats(chat_df)),
+        ("generate_wordcloud", lambda: analysis.generate_wordcloud(chat_df)),
+        ("messages_over_time", lambda: analysis.messages_over_time(chat_df)),
+        ("avg_message_length", lambda: analysis.avg_message_length(chat_df)),
+        ("top_words", lambda: analysis.top_words(chat_df)),
+        ("emoji_usage", lambda: analysis.emoji_usage(chat_df)),
+        ("chat_profile", lambda: analysis.ChatProfile.from_frame(chat_df)),
+        ("train_preprocess", lambda: clean_texts(df["message"].astype(str))),
+    ]
+
+
+def _time(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _peak_memory(fn):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, repeat=3, measure_memory=True, stages=None, **gen_kwargs):
+    """Benchmark every stage at every size; returns the JSON-ready report."""
+    get_model()  # load the model once, outside the timings
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            path = os.path.join(tmp, f"chat_{size}.txt")
+            file_bytes = write_chat(path, size, **gen_kwargs)
+            df = load_chat(path)
+            chat_df = clean_chat(df)
+            n_messages = len(df)
+            print(f"📂 {size} messages ({file_bytes / 1e6:.1f} MB)")
+
+            for name, fn in _stages(path, df, chat_df):
+                if stages and name not in stages:
+                    continue
+                seconds = _time(fn, repeat)
+                entry = {
+                    "messages": n_messages,
+                    "bytes": file_bytes,
+                    "seconds": round(seconds, 6),
+                    "messages_per_s": round(n_messages / seconds, 1) if seconds else None,
+                }
+                if measure_memory:
+                    entry["peak_memory_bytes"] = _peak_memory(fn)
+                results[f"{name}@{size}"] = entry
+                mem = f", peak {entry['peak_memory_bytes'] / 1e6:.1f} MB" if measure_memory else ""
+                print(f"  ⏱️ {name:<20} {seconds * 1000:10.2f} ms  "
+                      f"{entry['messages_per_s'] or 0:>12,.0f} msg/s{mem}")
+
+    return {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "repeat": repeat,
+        "generator": dict(gen_kwargs),
+        "results": results,
+    }
+
+
+def compare(report, baseline, threshold=0.25, memory_threshold=0.25):
+    """
+    Regressions of `report` against `baseline`: stages whose time (or peak
+    memory) grew by more than the threshold fraction. Returns a list of dicts.
+    """
+    regressions = []
+    for key, current in report["results"].items():
+        base = baseline.get("results", {}).get(key)
+        if not base:
+            continue
+        if (max(current["seconds"], base["seconds"]) >= MIN_COMPARABLE_SECONDS
+                and current["seconds"] > base["seconds"] * (1 + threshold)):
+            regressions.append({"stage": key, "metric": "seconds",
+                                "baseline": base["seconds"], "current": current["seconds"]})
+        if ("peak_memory_bytes" in current and "peak_memory_bytes" in base
+                and current["peak_memory_bytes"] > base["peak_memory_bytes"] * (1 + memory_threshold)):
+            regressions.append({"stage": key, "metric": "peak_memory_bytes",
+                                "baseline": base["peak_memory_bytes"],
+                                "current": current["peak_memory_bytes"]})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run",
+                                     description="Benchmark parsing, labelling, scoring and analysis.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES),
+                        help="chat sizes in messages (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per stage, best is kept")
+    parser.add_argument("--stages", nargs="+", default=None, help="only run these stages")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc run")
+    parser.add_argument("-o", "--output", default=None, help="write the JSON report here")
+    parser.add_argument("--baseline", default=BASELINE_PATH,
+                        help="baseline report to compare against (default: %(default)s)")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="store this run as the baseline instead of comparing")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed slowdown as a fraction (default: %(default)s)")
+    parser.add_argument("--memory-threshold", type=float, default=0.25,
+                        help="allowed peak-memory growth as a fraction (default: %(default)s)")
+    add_generator_args(parser)
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.sizes, repeat=args.repeat, measure_memory=not args.no_memory,
+                            stages=args.stages, **generator_kwargs(args))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✅ Report written to {args.output}")
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"⚠️ No baseline at {args.baseline}; run with --save-baseline to create one")
+        return 0
+
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("generator") != report["generator"]:
+        print("⚠️ Baseline was recorded with different generator settings; comparing anyway")
+
+    regressions = compare(report, baseline, args.threshold, args.memory_threshold)
+    if regressions:
+        print(f"\n❌ {len(regressions)} regression(s) against {args.baseline}:")
+        for r in regressions:
+            print(f"   {r['stage']} {r['metric']}: {r['baseline']} → {r['current']}")
+        return 1
+    print(f"\n✅ No regressions against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
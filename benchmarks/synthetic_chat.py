@@ -0,0 +1,133 @@
+# ================================
+# Synthetic WhatsApp Chat Generator
+# ================================
+# python -m benchmarks.synthetic_chat 1000000 -o chat.txt --time-format 12h
+#
+# Same seed + settings → byte-identical file, so benchmark runs compare.
+
+import argparse
+import os
+import random
+from datetime import datetime, timedelta
+
+SENDERS = ("Alice", "Bob", "Chloe", "Dev", "Esha", "Farhan", "Grace", "Hiro",
+           "Isha", "Jonas", "Kavya", "Liam")
+
+# Everyday words that do not trigger any SPAM_KEYWORDS rule
+HAM_WORDS = (
+    "hi", "hello", "ok", "lol", "see", "you", "tomorrow", "lunch", "meeting",
+    "where", "are", "we", "going", "tonight", "thanks", "sure", "call", "me",
+    "later", "good", "morning", "night", "how", "was", "the", "movie", "send",
+    "photos", "happy", "birthday", "running", "late", "home", "what", "time",
+    "dinner", "class", "notes", "weekend", "plans", "yes", "no", "maybe",
+    "traffic", "coffee", "great", "idea", "done", "busy", "sorry", "miss",
+    "exam", "bus", "station", "mom", "said", "okay", "tea", "rain", "today",
+)
+
+SPAM_TEMPLATES = (
+    "Congratulations you won a cash prize! Click here http://win-{n}.com to claim",
+    "FREE trial for {n} days, limited time offer, subscribe now",
+    "Earn {n}$ daily with bitcoin investment, join now",
+    "URGENT: verify your account password at www.secure-{n}.net",
+    "Exclusive discount voucher {n}, buy now and save big",
+    "You are the winner of our lottery, instant cash {n} waiting",
+)
+
+EMOJIS = ("😀", "😂", "😍", "👍", "🙏", "🎉", "🔥", "❤", "😭", "🤔", "✨", "🚀")
+
+ENCRYPTION_NOTICE = ("Messages and calls are end-to-end encrypted. No one outside "
+                     "of this chat, not even WhatsApp, can read or listen to them.")
+
+
+def _stamp(dt, time_format):
+    if time_format == "12h":
+        hour = dt.hour % 12 or 12
+        return f"{dt.day}/{dt.month}/{dt:%y}, {hour}:{dt:%M} {'PM' if dt.hour >= 12 else 'AM'}"
+    return f"{dt:%d/%m/%Y, %H:%M}"
+
+
+def iter_chat_lines(n_messages, seed=0, time_format="24h", multiline_ratio=0.05,
+                    emoji_density=0.2, spam_ratio=0.1, n_senders=8,
+                    start=datetime(2023, 1, 1, 8, 0)):
+    """
+    Yield the lines of a synthetic export with `n_messages` messages.
+    time_format: "24h" (DD/MM/YYYY, HH:MM) or "12h" (D/M/YY, H:MM AM/PM).
+    multiline_ratio / spam_ratio: share of messages that span several lines /
+    use a spam template; emoji_density: average emojis per message.
+    """
+    if time_format not in ("12h", "24h"):
+        raise ValueError(f"time_format must be '12h' or '24h', got {time_format!r}")
+    rng = random.Random(seed)
+    senders = SENDERS[:max(1, min(n_senders, len(SENDERS)))]
+    dt = start
+
+    yield f"{_stamp(dt, time_format)} - {ENCRYPTION_NOTICE}"
+    for _ in range(n_messages):
+        dt += timedelta(seconds=rng.randint(5, 900))
+        if rng.random() < spam_ratio:
+            text = rng.choice(SPAM_TEMPLATES).format(n=rng.randint(10, 9999))
+        else:
+            text = " ".join(rng.choices(HAM_WORDS, k=rng.randint(1, 14)))
+
+        # Integer emoji count whose mean is emoji_density
+        n_emojis = int(emoji_density) + (rng.random() < emoji_density % 1)
+        if n_emojis:
+            text += " " + "".join(rng.choices(EMOJIS, k=n_emojis))
+
+        lines = [text]
+        if rng.random() < multiline_ratio:
+            lines += [" ".join(rng.choices(HAM_WORDS, k=rng.randint(1, 8)))
+                      for _ in range(rng.randint(1, 3))]
+
+        yield f"{_stamp(dt, time_format)} - {rng.choice(senders)}: {lines[0]}"
+        yield from lines[1:]
+
+
+def generate_chat(n_messages, **kwargs):
+    """Whole synthetic export as one string (see iter_chat_lines for options)."""
+    return "\n".join(iter_chat_lines(n_messages, **kwargs)) + "\n"
+
+
+def write_chat(path, n_messages, chunk_lines=100_000, **kwargs):
+    """Stream a synthetic export to `path` (works for 10M+ messages); returns bytes written."""
+    buffer = []
+    with open(path, "w", encoding="utf-8", newline="\n") as f:
+        for line in iter_chat_lines(n_messages, **kwargs):
+            buffer.append(line)
+            if len(buffer) >= chunk_lines:
+                f.write("\n".join(buffer) + "\n")
+                buffer.clear()
+        if buffer:
+            f.write("\n".join(buffer) + "\n")
+    return os.path.getsize(path)
+
+
+def add_generator_args(parser):
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--time-format", choices=("24h", "12h"), default="24h")
+    parser.add_argument("--multiline-ratio", type=float, default=0.05)
+    parser.add_argument("--emoji-density", type=float, default=0.2)
+    parser.add_argument("--spam-ratio", type=float, default=0.1)
+    parser.add_argument("--senders", type=int, default=8)
+
+
+def generator_kwargs(args):
+    return {
+        "seed": args.seed,
+        "time_format": args.time_format,
+        "multiline_ratio": args.multiline_ratio,
+        "emoji_density": args.emoji_density,
+        "spam_ratio": args.spam_ratio,
+        "n_senders": args.senders,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.synthetic_chat",
+                                     description="Write a deterministic synthetic WhatsApp export.")
+    parser.add_argument("messages", type=int)
+    parser.add_argument("-o", "--output", default="synthetic_chat.txt")
+    add_generator_args(parser)
+    args = parser.parse_args()
+    size = write_chat(args.output, args.messages, **generator_kwargs(args))
+    print(f"✅ {args.messages} messages ({size / 1e6:.1f} MB) written to {args.output}")
@@ -1,20 +1,142 @@
+import re
 import pandas as pd
 
+# Spam signature keywords; a keyword's id is its index in this tuple
+SPAM_KEYWORDS = (
+    "http", "https", "www", ".com", ".net", ".org", ".in", "free", "offer", "win",
+    "money", "prize", "lottery", "click",
+    "winner", "gift", "trial", "bonus", "voucher", "urgent", "subscribe", "deal",
+    "congratulations", "won",
+    "discount", "limited", "cash", "reward", "claim", "exclusive", "promo",
+    "promotion", "guarantee", "risk-free",
+    "cheap", "save", "bargain", "sale", "earn", "bitcoin", "crypto", "investment",
+    "loan", "credit", "referral",
+    "pay", "payment", "account", "password", "verify", "alert", "notification",
+    "coupon",
+    "subscribe now", "join now", "act fast", "limited time", "buy now", "click here",
+    "get it now",
+    "visit", "register", "sign up", "apply", "cash prize", "instant cash",
+    "free trial", "special offer",
+    "congratulations you won", "winner announcement",
+)
+
+
+_WORD = re.compile(r"\w+")  # the same word characters as _is_word_char
+
+
+def _is_word_char(ch):
+    return ch.isalnum() or ch == "_"
+
+
+class KeywordMatcher:
+    """
+    Multi-keyword matcher over a fixed keyword list.
+    contains_any() answers "any keyword?" for a whole Series with one
+    vectorized pattern; find() returns the ids of every keyword found on
+    token boundaries: "win" does not fire inside "window" and "pay" does
+    not fire inside "repay". A plural "s" after a keyword is allowed.
+    """
+
+    def __init__(self, keywords):
+        self.keywords = tuple(k.lower() for k in keywords)
+
+        # Single-word keywords are whole tokens, found with one dict lookup
+        # per token. Phrases and keywords like ".com" are searched for with
+        # str.find and their boundaries checked by hand, only in messages
+        # holding their first word run ("com" for ".com") as a token.
+        self._words = {}
+        self._phrases = {}
+        self._unanchored = []
+        for kw_id, keyword in enumerate(self.keywords):
+            if not keyword:
+                continue
+            anchor = _WORD.search(keyword)
+            entry = (kw_id, keyword, _is_word_char(keyword[:1]), _is_word_char(keyword[-1:]))
+            if anchor is None:
+                self._unanchored.append(entry)
+            elif anchor.group() == keyword:
+                self._words.setdefault(keyword, []).append(kw_id)
+            else:
+                self._phrases.setdefault(anchor.group(), []).append(entry)
+
+        # Boundaries are matched as characters, not lookarounds, so pandas
+        # can run the pattern on the Arrow (RE2) engine; RE2's ASCII \W makes
+        # it a superset of find(), which then only runs on the matches.
+        groups = {}
+        for keyword in sorted(filter(None, self.keywords), key=len, reverse=True):
+            left = r"(?:^|\W)" if _is_word_char(keyword[0]) else ""
+            right = r"s?(?:\W|$)" if _is_word_char(keyword[-1]) else ""
+            groups.setdefault((left, right), []).append(re.escape(keyword))
+        self._any_pattern = "|".join(
+            f"{left}(?:{'|'.join(alts)}){right}" for (left, right), alts in groups.items()
+        )
+
+    @staticmethod
+    def _ends_token(text, end):
+        """True if a keyword ending before index `end` ends a token."""
+        if end < len(text) and text[end] == "s":
+            end += 1
+        return end >= len(text) or not _is_word_char(text[end])
+
+    def find(self, text):
+        """Return the sorted ids of keywords present in text."""
+        if not isinstance(text, str):
+            return ()
+        text = text.lower()
+        hits = set()
+        # A keyword token may carry a plural "s"
+        tokens = set(_WORD.findall(text))
+        tokens.update([token[:-1] for token in tokens if token[-1] == "s"])
+        for word in self._words.keys() & tokens:
+            hits.update(self._words[word])
+        searches = list(self._unanchored)
+        for word in self._phrases.keys() & tokens:
+            searches.extend(self._phrases[word])
+        for kw_id, keyword, word_start, word_end in searches:
+            start = text.find(keyword)
+            while start != -1:
+                if ((not word_start or start == 0 or not _is_word_char(text[start - 1]))
+                        and (not word_end or self._ends_token(text, start + len(keyword)))):
+                    hits.add(kw_id)
+                    break
+                start = text.find(keyword, start + 1)
+        return tuple(sorted(hits))
+
+    def contains_any(self, messages):
+        """Boolean array: does each message contain a keyword (vectorized superset of find)."""
+        if not isinstance(messages, pd.Series):
+            messages = pd.Series(list(messages))
+        if messages.dtype == object:
+            messages = messages.astype("str")  # object dtype would scan with Python's re
+        return messages.str.contains(self._any_pattern, case=False, na=False).to_numpy(dtype=bool)
+
+    def find_all(self, messages):
+        """find() over a batch of messages, returned as a list of id tuples."""
+        if not isinstance(messages, pd.Series):
+            messages = pd.Series(list(messages))
+        hits = [()] * len(messages)
+        values = messages.to_numpy()
+        found = {}  # verbatim repeats (forwards, templates) are matched once
+        for i in self.contains_any(messages).nonzero()[0]:
+            text = values[i]
+            if text not in found:
+                found[text] = self.find(text)
+            hits[i] = found[text]
+        return hits
+
+
+# Built once at import time and shared by every auto_label call
+SPAM_MATCHER = KeywordMatcher(SPAM_KEYWORDS)
+
+
 def auto_label(df):
     """
-    Adds 'auto_spam' column = True if message looks like spam
+    Adds 'auto_spam' column = True if message looks like spam,
+    and 'auto_spam_hits' = ids of the SPAM_KEYWORDS that matched
     """
-    spam_keywords = (
-    r"http|https|www|\.com|\.net|\.org|\.in|free|offer|win|money|prize|lottery|click|"
-    r"winner|gift|trial|bonus|voucher|urgent|subscribe|deal|congratulations|won|"
-    r"discount|limited|cash|reward|claim|exclusive|promo|promotion|guarantee|risk-free|"
-    r"cheap|save|bargain|sale|earn|bitcoin|crypto|investment|loan|credit|referral|"
-    r"pay|payment|account|password|verify|alert|notification|coupon|"
-    r"subscribe now|join now|act fast|limited time|buy now|click here|get it now|"
-    r"visit|register|sign up|apply|cash prize|instant cash|free trial|special offer|"
-    r"congratulations you won|winner announcement"
-    )
-    df['auto_spam'] = df['message'].str.contains(spam_keywords, case=False, na=False)
+    hits = SPAM_MATCHER.find_all(df['message'])
+    df['auto_spam_hits'] = hits
+    df['auto_spam'] = [bool(h) for h in hits]
     df['auto_spam_label'] = df['auto_spam'].map({True: "Spam", False: "Ham"})
     return df
 
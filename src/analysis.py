@@ -10,11 +10,13 @@ from collections import Counter
 
 # Import preprocessing functions
 from src.data_preprocessing import load_chat, clean_chat
+from src.instrumentation import instrumented
 
 
 # -------------------------------
 # 1. Basic Stats
 # -------------------------------
+@instrumented("analysis.chat_stats")
 def chat_stats(df):
     """Return total messages, unique participants, most active senders."""
     if df.empty:
@@ -28,10 +30,11 @@ def chat_stats(df):
 # -------------------------------
 # 2. Word Cloud
 # -------------------------------
+@instrumented("analysis.generate_wordcloud")
 def generate_wordcloud(df, bg_color="#ffffff", max_words=200):
     if df.empty: return None
     text = " ".join(df['message'].astype(str).tolist())
-    sw = set(STOPWORDS) | {"http","https","www","com"}
+    sw = STOP_WORDS
     wc = WordCloud(width=800, height=400, stopwords=sw,
                    background_color=bg_color, max_words=max_words,
                    collocations=False).generate(text)
@@ -41,6 +44,7 @@ def generate_wordcloud(df, bg_color="#ffffff", max_words=200):
 # -------------------------------
 # 3. Messages Over Time
 # -------------------------------
+@instrumented("analysis.messages_over_time")
 def messages_over_time(df, freq='D'):
     if df.empty: return pd.Series(dtype=int)
     tmp = df.copy()
@@ -55,6 +59,7 @@ def messages_over_time(df, freq='D'):
 # -------------------------------
 # 4. Average Message Length
 # -------------------------------
+@instrumented("analysis.avg_message_length")
 def avg_message_length(df):
     """Return avg message length per sender."""
     if df.empty:
@@ -68,14 +73,18 @@ def avg_message_length(df):
 # -------------------------------
 # 5. Top Words
 # -------------------------------
+WORD_PATTERN = re.compile(r"\b[^\d\W_]{3,}\b", flags=re.UNICODE)
+STOP_WORDS = set(STOPWORDS) | {"http","https","www","com"}
+
+
+@instrumented("analysis.top_words")
 def top_words(df, n=20):
     """Return top n common words."""
     if df.empty:
         return []
     text = " ".join(df['message'].tolist()).lower()
-    tokens = re.findall(r"\b[^\d\W_]{3,}\b", text, flags=re.UNICODE)
-    sw = set(STOPWORDS) | {"http","https","www","com"}
-    tokens = [t for t in tokens if t not in sw]
+    tokens = WORD_PATTERN.findall(text)
+    tokens = [t for t in tokens if t not in STOP_WORDS]
     return Counter(tokens).most_common(n)
 
 
@@ -84,29 +93,29 @@ def top_words(df, n=20):
 # -------------------------------
 # 6. Emoji Usage
 # -------------------------------
-
-
+EMOJI_PATTERN = re.compile(
+    "["
+    "\U0001F600-\U0001F64F"  # emoticons
+    "\U0001F300-\U0001F5FF"  # symbols & pictographs
+    "\U0001F680-\U0001F6FF"  # transport & map symbols
+    "\U0001F1E0-\U0001F1FF"  # flags
+    "\U00002700-\U000027BF"  # dingbats
+    "\U0001F900-\U0001F9FF"  # supplemental symbols
+    "]+",
+    flags=re.UNICODE
+)
+
+
+@instrumented("analysis.emoji_usage")
 def emoji_usage(df, message_col="message", top_n=20):
     """
     Returns top N emojis used in the chat as a list of tuples: [(emoji, count), ...]
     """
-    emoji_pattern = re.compile(
-        "["
-        "\U0001F600-\U0001F64F"  # emoticons
-        "\U0001F300-\U0001F5FF"  # symbols & pictographs
-        "\U0001F680-\U0001F6FF"  # transport & map symbols
-        "\U0001F1E0-\U0001F1FF"  # flags
-        "\U00002700-\U000027BF"  # dingbats
-        "\U0001F900-\U0001F9FF"  # supplemental symbols
-        "]+",
-        flags=re.UNICODE
-    )
-
     all_emojis = []
 
     # Loop through each message
     for msg in df[message_col].dropna():
-        all_emojis.extend(emoji_pattern.findall(msg))
+        all_emojis.extend(EMOJI_PATTERN.findall(msg))
 
     if not all_emojis:
         return []
@@ -117,4 +126,107 @@ def emoji_usage(df, message_col="message", top_n=20):
     return top_emojis
 
 
+# -------------------------------
+# 7. Single-pass Chat Profile
+# -------------------------------
+class ChatProfile:
+    """
+    Every chat aggregate the dashboard needs, built in one pass: per-sender
+    message counts, characters, word and emoji counts, the top-word and
+    emoji tallies, and daily / hourly / weekday message buckets.
+    Profiles of consecutive chunks of a chat merge() into the whole chat's.
+    """
 
+    def __init__(self):
+        self.sender_messages = Counter()
+        self.sender_chars = Counter()
+        self.sender_words = Counter()   # all word tokens, stop words included
+        self.sender_emojis = Counter()
+        self.word_counts = Counter()    # stop words removed (top words / word cloud)
+        self.emoji_counts = Counter()
+        self.daily = Counter()          # datetime.date -> messages
+        self.hourly = Counter()         # hour 0-23 -> messages
+        self.weekday = Counter()        # 0 = Monday -> messages
+
+    @classmethod
+    def from_frame(cls, df):
+        return cls().update(df)
+
+    def update(self, df):
+        """Add a DataFrame of messages (datetime, sender, message) to the profile."""
+        if df.empty:
+            return self
+        messages = df["message"].dropna().astype(str)
+        senders = df["sender"].loc[messages.index]
+
+        # One scan of each sender's text: the messages are joined with "\n" so
+        # words and emoji runs never cross a message boundary
+        for sender, msgs in messages.groupby(senders, sort=False):
+            text = "\n".join(msgs.tolist())
+            words = WORD_PATTERN.findall(text.lower())
+            emojis = EMOJI_PATTERN.findall(text)
+            self.sender_messages[sender] += len(msgs)
+            self.sender_chars[sender] += len(text) - (len(msgs) - 1)
+            self.sender_words[sender] += len(words)
+            self.sender_emojis[sender] += len(emojis)
+            self.word_counts.update(words)
+            self.emoji_counts.update(emojis)
+        for word in STOP_WORDS & self.word_counts.keys():
+            del self.word_counts[word]
+
+        stamps = pd.to_datetime(df["datetime"], errors="coerce").loc[messages.index].dropna()
+        if not stamps.empty:
+            days = stamps.dt.floor("D").value_counts()
+            self.daily.update(dict(zip(days.index.date, days.tolist())))
+            self.hourly.update(stamps.dt.hour.value_counts().to_dict())
+            self.weekday.update(stamps.dt.dayofweek.value_counts().to_dict())
+        return self
+
+    def merge(self, other):
+        """Fold another profile (e.g. of newly appended messages) into this one."""
+        for name, counter in vars(other).items():
+            getattr(self, name).update(counter)
+        return self
+
+    # ---- Views matching the per-function API above ----
+    @property
+    def total_messages(self):
+        return sum(self.sender_messages.values())
+
+    def chat_stats(self):
+        """(total messages, participants, messages per sender), like chat_stats(df)."""
+        active = pd.Series(dict(self.sender_messages.most_common()), dtype=int, name="count")
+        active.index.name = "sender"
+        return self.total_messages, len(self.sender_messages), active
+
+    def messages_over_time(self):
+        """Messages per day, zero-filled between the first and last day."""
+        if not self.daily:
+            return pd.Series(dtype=int)
+        days = pd.date_range(min(self.daily), max(self.daily), freq="D").date
+        return pd.Series([self.daily.get(day, 0) for day in days], index=days)
+
+    def avg_message_length(self):
+        """Average message length per sender, longest first."""
+        if not self.sender_messages:
+            return pd.Series(dtype=float)
+        avg = pd.Series({s: self.sender_chars[s] / n for s, n in self.sender_messages.items()},
+                        name="msg_len")
+        avg.index.name = "sender"
+        return avg.round(1).sort_values(ascending=False)
+
+    def top_words(self, n=20):
+        return self.word_counts.most_common(n)
+
+    def emoji_usage(self, top_n=20):
+        return self.emoji_counts.most_common(top_n)
+
+
+@instrumented("analysis.profile_wordcloud")
+def profile_wordcloud(profile, bg_color="#ffffff", max_words=200):
+    """Word cloud drawn from a ChatProfile's word counts (no re-tokenizing)."""
+    if not profile.word_counts:
+        return None
+    wc = WordCloud(width=800, height=400, background_color=bg_color,
+                   max_words=max_words, collocations=False)
+    return wc.generate_from_frequencies(profile.word_counts)
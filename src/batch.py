@@ -0,0 +1,257 @@
+# ================================
+# Batch Scoring of Chat Exports
+# ================================
+# python -m src.predict <dirs|globs|files> --output predictions.jsonl
+
+import argparse
+import glob
+import hashlib
+import importlib.util
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from src.prediction_cache import CACHE_ENV
+from src.predict import MODEL_REGISTRY, predict_chat
+
+CHAT_EXTENSIONS = (".txt", ".zip")
+PARQUET_ENGINES = ("pyarrow", "fastparquet")  # either one lets pandas write .parquet
+OUTPUT_COLUMNS = ["datetime", "sender", "message", "auto_spam", "prediction", "final_prediction",
+                  "cluster_id", "cluster_size"]
+
+
+def find_chat_files(inputs):
+    """Expand directories (recursively), globs and file paths into chat files."""
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, names in os.walk(item):
+                files += [os.path.join(root, n) for n in names if n.lower().endswith(CHAT_EXTENSIONS)]
+        elif glob.has_magic(item):
+            files += [p for p in glob.glob(item, recursive=True) if os.path.isfile(p)]
+        elif os.path.isfile(item):
+            files.append(item)
+        else:
+            raise FileNotFoundError(f"No chat file, directory or glob match: {item}")
+    # De-duplicate, keep a stable order
+    return sorted({os.path.abspath(f) for f in files})
+
+
+# -------------------------------
+# Worker side
+# -------------------------------
+def _init_worker():
+    """Load the model once per worker process."""
+    MODEL_REGISTRY.get()
+
+
+def _cache_counts():
+    """(hits, misses) of this worker's prediction cache, if one is configured."""
+    cache = getattr(MODEL_REGISTRY.get(), "cache", None)
+    return (cache.hits, cache.misses) if cache is not None else None
+
+
+def _score_file(path, near_duplicates=False):
+    """Score one chat; returns (summary, predictions DataFrame or None)."""
+    start = time.perf_counter()
+    summary = {"file": path}
+    cache_before = _cache_counts()
+    try:
+        results = predict_chat(path, near_duplicates=near_duplicates)
+    except Exception as e:
+        summary.update(status="error", error=str(e), messages=0,
+                       seconds=round(time.perf_counter() - start, 4))
+        return summary, None
+
+    spam = int((results["final_prediction"] == "Spam").sum())
+    summary.update(
+        status="ok",
+        messages=len(results),
+        spam=spam,
+        spam_rate=round(spam / len(results) * 100, 2),
+        seconds=round(time.perf_counter() - start, 4),
+        model_version=MODEL_REGISTRY.version,
+    )
+    if near_duplicates:
+        summary.update(clusters=int(results["cluster_id"].nunique()),
+                       largest_cluster=int(results["cluster_size"].max()))
+    if cache_before is not None:
+        hits, misses = (after - before for after, before in zip(_cache_counts(), cache_before))
+        summary.update(cache_hits=hits, cache_misses=misses)
+    results = results[[c for c in OUTPUT_COLUMNS if c in results.columns]].copy()
+    results.insert(0, "file", path)
+    return summary, results
+
+
+# -------------------------------
+# Output + progress
+# -------------------------------
+def _load_progress(summary_path):
+    """Files already scored successfully in a previous (interrupted) run."""
+    done = set()
+    if os.path.exists(summary_path):
+        with open(summary_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # a line cut short by a crash; that file is scored again
+                if isinstance(entry, dict) and entry.get("status") == "ok" and "file" in entry:
+                    done.add(entry["file"])
+    return done
+
+
+def _end_last_line(path):
+    """Terminate a line cut short by a crash, so the next append starts a fresh line."""
+    if os.path.isfile(path) and os.path.getsize(path):
+        with open(path, "rb+") as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+
+
+def _drop_unfinished(output, done):
+    """
+    Rewrite a JSONL `output` keeping only the rows of `done` files. Rows of a
+    file interrupted before its summary line was written would otherwise be
+    appended a second time when it is scored again.
+    """
+    if output.endswith(".parquet") or not os.path.isfile(output):
+        return  # Parquet parts are simply overwritten
+    tmp_path = f"{output}.tmp"
+    with open(output, "r", encoding="utf-8") as src, open(tmp_path, "w", encoding="utf-8") as dst:
+        for line in src:
+            try:
+                keep = json.loads(line)["file"] in done
+            except (ValueError, KeyError, TypeError):
+                keep = False
+            if keep:
+                dst.write(line)
+    os.replace(tmp_path, output)
+
+
+def _parquet_part_path(output, path):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    digest = hashlib.sha1(path.encode("utf-8")).hexdigest()[:8]
+    return os.path.join(output, f"{stem}-{digest}.parquet")
+
+
+def check_output(output):
+    """Raise ImportError before any scoring if `output` needs a missing Parquet engine."""
+    if output.endswith(".parquet") and not any(
+        importlib.util.find_spec(engine) for engine in PARQUET_ENGINES
+    ):
+        raise ImportError(
+            f"Writing {output} needs a Parquet engine: pip install pyarrow "
+            "(or fastparquet), or write .jsonl instead"
+        )
+
+
+def _write_results(results, output, path):
+    """Append one chat's predictions to the JSONL file or Parquet directory."""
+    if output.endswith(".parquet"):
+        os.makedirs(output, exist_ok=True)
+        results.to_parquet(_parquet_part_path(output, path), index=False)
+    else:
+        with open(output, "a", encoding="utf-8") as f:
+            f.write(results.to_json(orient="records", lines=True, date_format="iso", force_ascii=False))
+
+
+def run_batch(inputs, output, workers=None, summary_path=None, resume=True,
+              near_duplicates=False):
+    """
+    Score every chat under `inputs` in a process pool and write predictions
+    to `output` (.jsonl file, or a .parquet directory with one part per chat).
+    One summary line per file is appended to `summary_path` as soon as the
+    file is done; with resume=True those files are skipped on the next run,
+    and JSONL rows of files cut off before their summary line are dropped.
+    near_duplicates=True adds cluster_id / cluster_size to the predictions.
+    Returns a throughput report dict.
+    """
+    check_output(output)
+    summary_path = summary_path or f"{output}.summary.jsonl"
+    files = find_chat_files(inputs)
+    done = _load_progress(summary_path) if resume else set()
+    if resume:
+        _end_last_line(summary_path)
+        _drop_unfinished(output, done)
+    else:
+        for stale in (output, summary_path):
+            if os.path.isfile(stale):
+                os.remove(stale)
+    pending = [f for f in files if f not in done]
+
+    print(f"📂 {len(files)} chat files, {len(done & set(files))} already done, {len(pending)} to score")
+
+    start = time.perf_counter()
+    n_files = n_messages = n_errors = cache_hits = cache_misses = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool, \
+            open(summary_path, "a", encoding="utf-8") as summary_file:
+        futures = [pool.submit(_score_file, path, near_duplicates) for path in pending]
+        for future in as_completed(futures):
+            summary, results = future.result()
+            if results is not None:
+                _write_results(results, output, summary["file"])
+                n_messages += summary["messages"]
+                cache_hits += summary.get("cache_hits", 0)
+                cache_misses += summary.get("cache_misses", 0)
+            else:
+                n_errors += 1
+            n_files += 1
+
+            # Written after the predictions so a resumed run never skips unwritten work
+            summary_file.write(json.dumps(summary) + "\n")
+            summary_file.flush()
+            status = "✅" if summary["status"] == "ok" else "❌"
+            print(f"{status} [{n_files}/{len(pending)}] {summary['file']}: "
+                  f"{summary.get('messages', 0)} messages, {summary.get('spam', 0)} spam")
+
+    elapsed = time.perf_counter() - start
+    report = {
+        "files": n_files,
+        "errors": n_errors,
+        "messages": n_messages,
+        "seconds": round(elapsed, 3),
+        "files_per_s": round(n_files / elapsed, 2) if elapsed else 0.0,
+        "messages_per_s": round(n_messages / elapsed, 1) if elapsed else 0.0,
+    }
+    print(f"\n📊 {n_files} files ({n_errors} errors), {n_messages} messages in {elapsed:.2f}s "
+          f"→ {report['files_per_s']} files/s, {report['messages_per_s']} messages/s")
+    if cache_hits or cache_misses:
+        report["cache_hit_ratio"] = round(cache_hits / (cache_hits + cache_misses), 4)
+        print(f"🗄️ Prediction cache: {cache_hits} hits, {cache_misses} misses "
+              f"({report['cache_hit_ratio']:.1%} hit ratio)")
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m src.predict",
+        description="Score WhatsApp chat exports in parallel.",
+    )
+    parser.add_argument("inputs", nargs="+", help="chat files, directories or glob patterns")
+    parser.add_argument("-o", "--output", default="predictions.jsonl",
+                        help="predictions .jsonl file, or .parquet directory (default: %(default)s)")
+    parser.add_argument("-j", "--workers", type=int, default=None,
+                        help="worker processes (default: CPU count)")
+    parser.add_argument("--summary", default=None,
+                        help="per-file summary / progress log (default: <output>.summary.jsonl)")
+    parser.add_argument("--no-resume", action="store_true",
+                        help="start over instead of skipping files already scored")
+    parser.add_argument("--prediction-cache", default=None, metavar="PATH",
+                        help="SQLite prediction cache shared by the workers "
+                             f"(default: ${CACHE_ENV} if set)")
+    parser.add_argument("--near-duplicates", action="store_true",
+                        help="cluster near-duplicate messages (spam campaigns) and "
+                             "score each cluster once")
+    args = parser.parse_args(argv)
+    try:
+        check_output(args.output)
+    except ImportError as e:
+        parser.error(str(e))
+    if args.prediction_cache:
+        os.environ[CACHE_ENV] = args.prediction_cache  # inherited by the worker processes
+    return run_batch(args.inputs, args.output, workers=args.workers,
+                     summary_path=args.summary, resume=not args.no_resume,
+                     near_duplicates=args.near_duplicates)
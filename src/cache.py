@@ -0,0 +1,68 @@
+# ================================
+# Upload Result Cache
+# ================================
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+def content_key(data, model_version):
+    """SHA-256 of the uploaded bytes plus the model version."""
+    digest = hashlib.sha256(data)
+    digest.update(b"\0")
+    digest.update(str(model_version).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    Bounded, thread-safe LRU cache for per-upload results.
+    Keys come from content_key(); once more than `max_entries` keys are
+    stored, the least recently used one is evicted.
+    """
+
+    def __init__(self, max_entries=8):
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, key, compute):
+        """Return the cached value for key, computing and storing it on a miss."""
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is sentinel:
+            # Computed outside the lock so other sessions are not blocked
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -2,55 +2,137 @@
 # WhatsApp Chat Preprocessing Module
 # ================================
 
+import codecs
+import io
+import itertools
+import mmap
+import os
 import re
+import zipfile
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
 
-def load_chat(file_path):
+from src.instrumentation import is_enabled, span
+
+# Regex pattern for WhatsApp messages:
+# Handles dates, times (with optional AM/PM), dash or EN dash, sender, message
+LINE_PATTERN = re.compile(
+    r"^(\d{1,2}/\d{1,2}/\d{2,4}), "
+    r"(\d{1,2}:\d{2}(?::\d{2})?\s?(?:AM|PM|am|pm)?)\s?[–-] (.*?): (.*)$"
+)
+
+# Normalized 'date time' stamp, as built by _normalize_stamp
+STAMP_PATTERN = re.compile(
+    r"^(?P<first>\d{1,2})/(?P<second>\d{1,2})/(?P<year>\d{2,4}) "
+    r"\d{1,2}:\d{2}(?P<seconds>:\d{2})?(?: ?(?P<ampm>[AaPp][Mm]))?$"
+)
+
+DATETIME_FORMATS = ("%d/%m/%Y %H:%M", "%d/%m/%Y %I:%M %p",
+                    "%d/%m/%y %H:%M", "%d/%m/%y %I:%M %p")
+
+CHAT_COLUMNS = ["datetime", "sender", "message"]
+
+# Number of message headers sampled to detect a file's datetime format
+FORMAT_SAMPLE_SIZE = 200
+
+# Files smaller than this are not worth splitting across processes
+PARALLEL_MIN_BYTES = 8 * 1024 * 1024
+
+
+def _normalize_stamp(date_str, time_str):
+    """Join date + time into one 'date time' string with plain spaces."""
+    # Newer exports put a narrow no-break space before AM/PM
+    return f"{date_str} {' '.join(time_str.split())}"
+
+
+def _parse_datetime(stamp):
+    """Parse datetime safely with multiple formats, None if none match."""
+    for fmt in DATETIME_FORMATS:
+        try:
+            return datetime.strptime(stamp, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def detect_datetime_format(stamps):
     """
-    Loads WhatsApp chat from exported .txt file.
-    Handles multiline messages and extracts datetime, sender, and message.
-    Returns a DataFrame with columns: [datetime, sender, message]
+    Sniffs the strptime format of a chat from sample 'date time' stamps.
+    Day/month order, 2/4-digit years, 12/24-hour clock and seconds are
+    decided once per file. Returns None when there are no samples.
     """
-    chat_data = []
+    matches = [STAMP_PATTERN.match(s) for s in stamps if isinstance(s, str)]
+    matches = [m for m in matches if m]
+    if not matches:
+        return None
 
-    # Regex pattern for WhatsApp messages:
-    # Handles dates, times (with optional AM/PM), dash or EN dash, sender, message
-    line_pattern = re.compile(
-        r"^(\d{1,2}/\d{1,2}/\d{2,4}), "
-        r"(\d{1,2}:\d{2}(?::\d{2})?\s?(?:AM|PM|am|pm)?)\s?[–-] (.*?): (.*)$"
-    )
+    day_first = True
+    for m in matches:
+        if int(m.group("first")) > 12:
+            break
+        if int(m.group("second")) > 12:
+            day_first = False
+            break
+
+    sample = matches[0]
+    year = "%Y" if len(sample.group("year")) == 4 else "%y"
+    date_fmt = f"%d/%m/{year}" if day_first else f"%m/%d/{year}"
+
+    twelve_hour = sample.group("ampm") is not None
+    clock = "%I:%M" if twelve_hour else "%H:%M"
+    if sample.group("seconds"):
+        clock += ":%S"
+    if twelve_hour:
+        clock += " %p"
+
+    return f"{date_fmt} {clock}"
 
-    with open(file_path, "r", encoding="utf-8") as f:
-        lines = f.readlines()
 
+def parse_datetimes(stamps, fmt=None):
+    """
+    Converts raw 'date time' stamps to datetimes with one vectorized
+    pd.to_datetime call using `fmt` (sniffed if not given). Only stamps
+    that do not fit the format fall back to per-row parsing.
+    """
+    stamps = pd.Series(stamps, dtype="object")
+    if fmt is None:
+        fmt = detect_datetime_format(stamps.head(FORMAT_SAMPLE_SIZE).tolist())
+    if fmt is None:
+        return pd.Series(pd.NaT, index=stamps.index, dtype="datetime64[ns]")
+
+    parsed = pd.to_datetime(stamps, format=fmt, errors="coerce")
+    outliers = parsed.isna() & stamps.notna()
+    if outliers.any():
+        parsed[outliers] = pd.to_datetime(stamps[outliers].map(_parse_datetime))
+    return parsed
+
+
+def iter_messages(lines):
+    """
+    Yields [stamp, sender, message] records from raw chat lines, where
+    stamp is the raw 'date time' string (see parse_datetimes).
+    Continuation lines are joined onto the message they follow, so a record
+    is only emitted once the next message header (or the end) is reached.
+    """
     current_sender = None
     current_message = []
-    current_datetime = None
+    current_stamp = None
 
     for line in lines:
         line = line.strip()
         if not line:
             continue
 
-        match = line_pattern.match(line)
+        match = LINE_PATTERN.match(line)
         if match:
-            # Save previous message
+            # Emit previous message
             if current_sender and current_message:
-                chat_data.append([current_datetime, current_sender, " ".join(current_message)])
+                yield [current_stamp, current_sender, " ".join(current_message)]
 
             date_str, time_str, sender, message = match.groups()
-
-            # Parse datetime safely with multiple formats
-            dt = None
-            for fmt in ("%d/%m/%Y %H:%M", "%d/%m/%Y %I:%M %p",
-                        "%d/%m/%y %H:%M", "%d/%m/%y %I:%M %p"):
-                try:
-                    dt = datetime.strptime(f"{date_str} {time_str}", fmt)
-                    break
-                except:
-                    continue
-            current_datetime = dt
+            current_stamp = _normalize_stamp(date_str, time_str)
             current_sender = sender
             current_message = [message]
         else:
@@ -58,18 +140,353 @@ def load_chat(file_path):
             if current_message is not None:
                 current_message.append(line)
 
-    # Save last message
+    # Emit last message
     if current_sender and current_message:
-        chat_data.append([current_datetime, current_sender, " ".join(current_message)])
+        yield [current_stamp, current_sender, " ".join(current_message)]
 
-    # Convert to DataFrame
-    df = pd.DataFrame(chat_data, columns=["datetime", "sender", "message"])
+
+def _records_to_frame(records, fmt=None):
+    """Build a chat DataFrame from parsed records and drop system/empty rows."""
+    df = pd.DataFrame(records, columns=CHAT_COLUMNS)
+    df["datetime"] = parse_datetimes(df["datetime"], fmt)
 
     # Drop system messages (like encryption notices)
     df = df[~df["message"].str.contains("end-to-end encryption", case=False, na=False)]
 
     # Remove empty rows
-    df = df[df["message"].str.strip() != ""].reset_index(drop=True)
+    return df[df["message"].str.strip() != ""]
+
+
+class _BufferReader(io.RawIOBase):
+    """Raw stream over a memoryview/mmap, read without copying it first."""
+
+    def __init__(self, view):
+        self._view = view
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        n = max(0, min(len(b), len(self._view) - self._pos))
+        b[:n] = self._view[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+    def seekable(self):
+        return True
+
+    def seek(self, pos, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: len(self._view)}[whence]
+        self._pos = max(0, base + pos)
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+    def close(self):
+        self._view.release()
+        super().close()
+
+
+ZIP_MAGIC = b"PK\x03\x04"
+
+
+def find_chat_entry(zf):
+    """
+    Name of the chat text inside a WhatsApp .zip export: `_chat.txt` (iOS),
+    else a "WhatsApp Chat ….txt" entry (Android), else the largest .txt.
+    """
+    entries = [i for i in zf.infolist()
+               if not i.is_dir() and i.filename.lower().endswith(".txt")
+               and not i.filename.startswith("__MACOSX/")]
+    if not entries:
+        raise ValueError("No chat .txt file found inside the zip export.")
+    for info in entries:
+        if os.path.basename(info.filename) == "_chat.txt":
+            return info.filename
+    android = [i for i in entries if os.path.basename(i.filename).startswith("WhatsApp Chat")]
+    return max(android or entries, key=lambda i: i.file_size).filename
+
+
+@contextmanager
+def _open_zip(file):
+    """Stream-decompress the chat entry of a zip; media entries are never read."""
+    with zipfile.ZipFile(file) as zf:
+        with zf.open(find_chat_entry(zf)) as entry:
+            yield io.TextIOWrapper(entry, encoding=_detect_encoding(entry.peek(4)[:4]))
+
+
+def _detect_encoding(head):
+    """Pick the codec from the first bytes: UTF-16 BOM, else UTF-8 (BOM optional)."""
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return "utf-16"
+    return "utf-8-sig"
+
+
+@contextmanager
+def open_chat(source):
+    """
+    Opens a chat source as a text stream, decoding lazily as it is read.
+    `source` may be a file path (memory-mapped), bytes / bytearray /
+    memoryview, a BytesIO-like object (its buffer is used directly), or any
+    binary or text file-like object. UTF-8 (with or without BOM) and UTF-16
+    are detected from the leading bytes, and a WhatsApp .zip export is read
+    by streaming its chat entry through decompression.
+    """
+    if isinstance(source, io.TextIOBase):
+        yield source
+        return
+
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            if f.read(4) == ZIP_MAGIC:
+                with _open_zip(f) as text:
+                    yield text
+                return
+            if os.fstat(f.fileno()).st_size == 0:
+                yield io.StringIO("")
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                with _open_view(memoryview(mm)) as text:
+                    yield text
+        return
+
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        view = memoryview(source)
+        if view[:4] == ZIP_MAGIC:
+            with _open_zip(io.BytesIO(view)) as text:
+                yield text
+            return
+    elif hasattr(source, "getbuffer"):  # BytesIO, Streamlit UploadedFile
+        view = source.getbuffer()
+        if view[:4] == ZIP_MAGIC:
+            view.release()
+            source.seek(0)
+            with _open_zip(source) as text:
+                yield text
+            return
+    else:
+        stream = source if hasattr(source, "peek") else io.BufferedReader(source)
+        text = None
+        try:
+            head = stream.peek(4)[:4]
+            if head == ZIP_MAGIC:
+                # Zip needs random access; non-seekable streams are read into memory
+                file = stream if stream.seekable() else io.BytesIO(stream.read())
+                with _open_zip(file) as zipped:
+                    yield zipped
+                return
+            text = io.TextIOWrapper(stream, encoding=_detect_encoding(head))
+            yield text
+        finally:
+            # The caller owns `source`: detach our wrappers so neither closes
+            # it, now or when garbage-collected
+            if text is not None and not text.closed:
+                text.detach()
+            if stream is not source and not stream.closed:
+                stream.detach()
+        return
+
+    with _open_view(view) as text:
+        yield text
+
+
+def source_size(source):
+    """Size in bytes of a chat source, when it can be known without reading it."""
+    if isinstance(source, (str, os.PathLike)):
+        return os.path.getsize(source)
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return memoryview(source).nbytes
+    if hasattr(source, "getbuffer"):
+        with source.getbuffer() as view:
+            return view.nbytes
+    return getattr(source, "size", None)
+
+
+@contextmanager
+def _open_view(view):
+    text = io.TextIOWrapper(
+        io.BufferedReader(_BufferReader(view)),
+        encoding=_detect_encoding(bytes(view[:4])),
+    )
+    try:
+        yield text
+    finally:
+        text.close()  # releases the view so mmap/BytesIO can be closed/resized
+
+
+def _sniff_head(f):
+    """
+    Sniff the datetime format once from the first message headers of an
+    open text file. Returns (fmt, head) where head holds the lines consumed.
+    """
+    head, stamps = [], []
+    for line in f:
+        head.append(line)
+        match = LINE_PATTERN.match(line.strip())
+        if match:
+            stamps.append(_normalize_stamp(*match.groups()[:2]))
+            if len(stamps) >= FORMAT_SAMPLE_SIZE:
+                break
+    return detect_datetime_format(stamps), head
+
+
+def sniff_datetime_format(source):
+    """Datetime format detected from the first message headers of a chat source."""
+    with open_chat(source) as f:
+        fmt, _ = _sniff_head(f)
+    return fmt
+
+
+def iter_chat(source, chunk_size=50_000, datetime_format=None):
+    """
+    Streams a WhatsApp chat export as DataFrame chunks of up to `chunk_size`
+    messages, reading the source line by line instead of all at once.
+    `source` is anything open_chat() accepts (path, bytes, buffer, file).
+    Multiline messages spanning a chunk boundary are kept whole.
+    `datetime_format` skips format detection (e.g. for a slice of a chat
+    whose format is already known).
+    Each chunk has columns: [datetime, sender, message]
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1")
+
+    offset = 0
+    with open_chat(source) as f:
+        if datetime_format:
+            fmt, head = datetime_format, []
+        else:
+            fmt, head = _sniff_head(f)
+
+        batch = []
+        for record in iter_messages(itertools.chain(head, f)):
+            batch.append(record)
+            if len(batch) >= chunk_size:
+                chunk = _records_to_frame(batch, fmt)
+                chunk.index = range(offset, offset + len(chunk))
+                offset += len(chunk)
+                batch = []
+                yield chunk
+        if batch:
+            chunk = _records_to_frame(batch, fmt)
+            chunk.index = range(offset, offset + len(chunk))
+            yield chunk
+
+
+def _message_start(f, offset, size):
+    """
+    Byte offset of the first line at or after `offset` that starts a
+    message (matches LINE_PATTERN), or `size` if there is none.
+    """
+    if offset > 0:
+        f.seek(offset - 1)
+        if f.read(1) != b"\n":
+            f.readline()  # skip the rest of a partial line
+    else:
+        f.seek(0)
+    while True:
+        start = f.tell()
+        line = f.readline()
+        if not line:
+            return size
+        if LINE_PATTERN.match(line.decode("utf-8", errors="replace").strip()):
+            return start
+
+
+def _parse_shard(args):
+    """Parse the messages in one byte range of a chat file, or in bytes (worker side)."""
+    source, start, end, fmt = args
+    if isinstance(source, bytes):
+        data = source
+    else:
+        with open(source, "rb") as f:
+            f.seek(start)
+            data = f.read(end - start)
+    text = io.TextIOWrapper(io.BytesIO(data), encoding="utf-8-sig")
+    return _records_to_frame(list(iter_messages(text)), fmt)
+
+
+def _shard_ranges(f, size, workers):
+    """`workers` (start, end) byte ranges of a binary file, realigned to message starts."""
+    bounds = sorted({_message_start(f, size * i // workers, size) for i in range(workers)})
+    # Lines before the first message header belong to no message
+    bounds = [0] + bounds[1:] if bounds else [0]
+    return [(start, end) for start, end in zip(bounds, bounds[1:] + [size]) if end > start]
+
+
+def _memory_view(source):
+    """memoryview over an in-memory chat: bytes / bytearray / memoryview or a BytesIO-like buffer."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return memoryview(source)
+    return source.getbuffer()
+
+
+def _load_chat_parallel(source, workers, fmt=None):
+    """
+    Split a chat file or in-memory buffer into byte ranges realigned to
+    message starts, parse the shards in worker processes and concatenate
+    them in source order. A buffer's shards are sent to the workers as bytes.
+    """
+    fmt = fmt or sniff_datetime_format(source)
+
+    if isinstance(source, (str, os.PathLike)):
+        size = os.path.getsize(source)
+        with open(source, "rb") as f:
+            shards = [(source, start, end, fmt) for start, end in _shard_ranges(f, size, workers)]
+    else:
+        with _memory_view(source) as view:
+            with io.BufferedReader(_BufferReader(view[:])) as f:
+                ranges = _shard_ranges(f, view.nbytes, workers)
+            shards = [(bytes(view[start:end]), 0, end - start, fmt) for start, end in ranges]
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_parse_shard, shards))
+
+
+def _can_split(source, workers):
+    """Parallel parsing needs a large, uncompressed UTF-8 file on disk or buffer in memory."""
+    if not (workers and workers > 1):
+        return False
+    if isinstance(source, (str, os.PathLike)):
+        if os.path.getsize(source) < PARALLEL_MIN_BYTES:
+            return False
+        with open(source, "rb") as f:
+            head = f.read(4)
+    elif isinstance(source, (bytes, bytearray, memoryview)) or hasattr(source, "getbuffer"):
+        with _memory_view(source) as view:
+            if view.nbytes < PARALLEL_MIN_BYTES:
+                return False
+            head = bytes(view[:4])
+    else:
+        return False
+    return head != ZIP_MAGIC and _detect_encoding(head) == "utf-8-sig"
+
+
+def load_chat(source, workers=None, datetime_format=None):
+    """
+    Loads WhatsApp chat from an exported .txt or .zip file, or from the
+    export's bytes / buffer / file object (see open_chat) without a temp file.
+    Handles multiline messages and extracts datetime, sender, and message.
+    With workers > 1, UTF-8 files and in-memory buffers of at least
+    PARALLEL_MIN_BYTES are parsed in parallel shards; the result is
+    identical to the sequential parser.
+    `datetime_format` skips format detection (see iter_chat).
+    Returns a DataFrame with columns: [datetime, sender, message]
+    """
+    with span("load_chat") as stage:
+        if is_enabled():
+            stage.set(bytes=source_size(source))
+        if _can_split(source, workers):
+            stage.set(shards=workers)
+            chunks = _load_chat_parallel(source, workers, datetime_format)
+        else:
+            chunks = list(iter_chat(source, datetime_format=datetime_format))
+        if chunks:
+            df = pd.concat(chunks, ignore_index=True)
+        else:
+            df = pd.DataFrame(columns=CHAT_COLUMNS)
+        stage.set(messages=len(df))
 
     if df.empty:
         raise ValueError("No messages loaded. Check your WhatsApp chat format.")
@@ -0,0 +1,239 @@
+# ================================
+# Reviewer Feedback + Online Model Updates
+# ================================
+# python -m src.feedback [--watch] [--interval 60]
+#
+# The dashboard appends reviewer corrections ("mark spam" / "mark ham") to
+# data/feedback.jsonl. apply_feedback() folds the corrections logged since
+# the LATEST bundle was built into its Naive Bayes counts (the update
+# MultinomialNB.partial_fit makes) and publishes the result as a new
+# version; MODEL_REGISTRY picks it up on its next version check. Older
+# versions written by these updates are then deleted, except the one
+# MODEL_REGISTRY has loaded; trained bundles are never deleted.
+# FeedbackUpdater runs that every minute in a background thread.
+
+import argparse
+import datetime
+import json
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+
+from src.inference import LinearScorer, nb_weights, smooth_idf
+from src.model_bundle import (BUNDLE_ROOT, MODELS_DIR, latest_version, load_bundle,
+                              prune_versions, publish_version, write_bundle)
+from src.predict import MODEL_REGISTRY
+
+FEEDBACK_PATH = os.path.join(os.path.dirname(MODELS_DIR), "data", "feedback.jsonl")
+DEFAULT_INTERVAL = 60.0  # seconds between updater runs
+SCORER_ARRAYS = ("terms", "idf", "coef")
+# Manifest metrics written by apply_feedback; the rest are the trained
+# bundle's hold-out metrics, which no longer describe an updated model
+FEEDBACK_METRICS = ("feedback_offset", "feedback_corrections", "updated_from",
+                    "trained_from", "parent_metrics")
+
+_write_lock = threading.Lock()
+
+
+# -------------------------------
+# Feedback log
+# -------------------------------
+def record_feedback(messages, labels, model_version=None, path=FEEDBACK_PATH):
+    """
+    Append one correction per message (label 1 = spam, 0 = ham) to the log.
+    `model_version` is the version that got it wrong. Returns the count.
+    """
+    created_at = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    lines = [
+        json.dumps({"message": str(message), "label": int(label),
+                    "model_version": model_version, "created_at": created_at},
+                   ensure_ascii=False) + "\n"
+        for message, label in zip(messages, labels)
+    ]
+    if lines:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with _write_lock, open(path, "a", encoding="utf-8") as f:
+            f.write("".join(lines))
+    return len(lines)
+
+
+def read_feedback(path=FEEDBACK_PATH, offset=0):
+    """
+    (messages, labels, end offset) of the complete log lines after byte
+    `offset`. A log shorter than `offset` was rotated and is read from 0.
+    """
+    try:
+        size = os.path.getsize(path)
+    except FileNotFoundError:
+        return [], [], 0
+    if size < offset:
+        offset = 0
+    with open(path, "rb") as f:
+        f.seek(offset)
+        data = f.read(size - offset)
+    data = data[:data.rfind(b"\n") + 1]  # a line still being written waits for the next run
+
+    messages, labels = [], []
+    for line in data.splitlines():
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue  # skip a corrupt line instead of blocking every later correction
+        if isinstance(record, dict) and record.get("label") in (0, 1) and record.get("message"):
+            messages.append(str(record["message"]))
+            labels.append(int(record["label"]))
+    return messages, labels, offset + len(data)
+
+
+# -------------------------------
+# Incremental update of a bundle
+# -------------------------------
+def updated_scorer(bundle, messages, labels):
+    """
+    Naive Bayes update of `bundle` with labelled messages. Returns the new
+    (scorer, state arrays). Vocabulary bundles keep their terms and idf;
+    feature-hashing bundles also update document frequencies, so words
+    first seen in corrections get a column.
+    """
+    arrays = bundle.manifest["arrays"]
+    missing = [name for name in ("class_count", "feature_count") if name not in arrays]
+    if missing:
+        raise ValueError(
+            f"Bundle {bundle.version} has no Naive Bayes counts ({', '.join(missing)}); "
+            "retrain it with src/train_model.py"
+        )
+    state = {name: np.array(bundle.array(name)) for name in arrays if name not in SCORER_ARRAYS}
+    config = dict(bundle.manifest["scorer"])
+    scorer = bundle.scorer()
+    labels = np.asarray(labels, dtype=np.int64)
+    seen = None
+
+    if "doc_freq" in state:
+        _, _, cols, _ = scorer.tfidf(messages)  # one entry per (message, term)
+        state["doc_freq"] += np.bincount(cols, minlength=len(state["doc_freq"]))
+        state["n_docs"] += len(messages)
+        seen = state["doc_freq"] > 0
+        idf = smooth_idf(state["doc_freq"], int(state["n_docs"][0]))
+        scorer = LinearScorer.from_arrays({"idf": idf, "coef": scorer.coef}, config)
+
+    _, rows, cols, values = scorer.tfidf(messages)
+    np.add.at(state["feature_count"], (labels[rows], cols), values)
+    state["class_count"] += np.bincount(labels, minlength=2)
+
+    alpha = float(state["alpha"][0]) if "alpha" in state else 1.0
+    coef, config["bias"] = nb_weights(state["feature_count"], state["class_count"], alpha, seen)
+    arrays = {"idf": scorer.idf, "coef": coef}
+    if scorer.terms is not None:
+        arrays["terms"] = scorer.terms
+    return LinearScorer.from_arrays(arrays, config), state
+
+
+def apply_feedback(root=BUNDLE_ROOT, path=FEEDBACK_PATH):
+    """
+    Fold corrections logged since the LATEST bundle was built into it and
+    publish the result. The trained bundle's hold-out metrics are kept
+    under `parent_metrics`, not as the new model's own. Older bundles
+    written by earlier updates are then deleted, except the one updated
+    and the version MODEL_REGISTRY has loaded. Returns the new version, or
+    None if there was nothing to apply (or another version was published
+    meanwhile).
+    """
+    bundle = load_bundle(root)
+    metrics = bundle.metrics
+    messages, labels, end = read_feedback(path, metrics.get("feedback_offset", 0))
+    if not messages:
+        return None
+
+    scorer, state = updated_scorer(bundle, messages, labels)
+    if "updated_from" in metrics:
+        trained_from = metrics.get("trained_from", metrics["updated_from"])
+        parent_metrics = metrics.get("parent_metrics") or {
+            name: value for name, value in metrics.items() if name not in FEEDBACK_METRICS
+        }
+    else:
+        trained_from, parent_metrics = bundle.version, metrics
+    metrics = {
+        "feedback_offset": end,
+        "feedback_corrections": metrics.get("feedback_corrections", 0) + len(messages),
+        "updated_from": bundle.version,
+        "trained_from": trained_from,
+        "parent_metrics": parent_metrics,
+    }
+    version = write_bundle(scorer, root, metrics=metrics, extra_arrays=state, publish=False)
+    if latest_version(root) != bundle.version:
+        # A retrain won the race; its bundle gets the corrections on the next run
+        shutil.rmtree(os.path.join(root, version), ignore_errors=True)
+        return None
+    publish_version(version, root)
+    prune_versions(keep={version, bundle.version, MODEL_REGISTRY.version}, root=root,
+                   before=bundle.version,
+                   where=lambda manifest: "updated_from" in manifest["metrics"])
+    return version
+
+
+class FeedbackUpdater(threading.Thread):
+    """
+    Daemon thread running apply_feedback every `interval` seconds. Errors
+    (e.g. a bundle without Naive Bayes counts) are kept in `last_error`
+    so the thread survives them.
+    """
+
+    def __init__(self, interval=DEFAULT_INTERVAL, root=BUNDLE_ROOT, path=FEEDBACK_PATH):
+        super().__init__(name="feedback-updater", daemon=True)
+        self.interval = interval
+        self.root = root
+        self.path = path
+        self.last_version = None
+        self.last_error = None
+        self._stopping = threading.Event()
+
+    def run(self):
+        while not self._stopping.wait(self.interval):
+            self.poll()
+
+    def poll(self):
+        """Apply pending corrections now; returns the published version or None."""
+        try:
+            version = apply_feedback(self.root, self.path)
+        except Exception as exc:
+            self.last_error = exc
+            return None
+        self.last_error = None
+        if version:
+            self.last_version = version
+        return version
+
+    def stop(self):
+        self._stopping.set()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m src.feedback",
+        description="Apply reviewer corrections to the LATEST model bundle.",
+    )
+    parser.add_argument("--path", default=FEEDBACK_PATH, help="feedback log (default: %(default)s)")
+    parser.add_argument("--root", default=BUNDLE_ROOT, help="bundle root (default: %(default)s)")
+    parser.add_argument("--watch", action="store_true", help="keep applying new corrections")
+    parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL)
+    args = parser.parse_args(argv)
+
+    updater = FeedbackUpdater(args.interval, args.root, args.path)
+    while True:
+        version = updater.poll()
+        if updater.last_error:
+            print(f"❌ {updater.last_error}")
+        elif version:
+            print(f"✅ Corrections applied; model bundle {version} published")
+        elif not args.watch:
+            print("No new corrections")
+        if not args.watch:
+            return updater.last_version
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
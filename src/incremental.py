@@ -0,0 +1,238 @@
+# ================================
+# Incremental Re-analysis of Re-exported Chats
+# ================================
+# python -m src.incremental chat.txt [--chat-id weekly-group]
+#
+# A re-export of a chat is the previous export plus new messages. For each
+# chat we persist the processed byte prefix (length + sha256), the last
+# message's timestamp and content hash, the prediction results and the
+# ChatProfile. A new export whose prefix is unchanged only has its delta
+# parsed, scored and merged; anything else falls back to a full rebuild.
+
+import argparse
+import hashlib
+import json
+import os
+import time
+import uuid
+
+import joblib
+import pandas as pd
+
+from src.analysis import ChatProfile
+from src.data_preprocessing import LINE_PATTERN, open_chat, sniff_datetime_format
+from src.instrumentation import count, span
+from src.model_bundle import MODELS_DIR
+from src.pipeline import ChatPipeline
+from src.predict import MODEL_REGISTRY
+
+STATE_DIR = os.path.join(os.path.dirname(MODELS_DIR), "data", "chat_state")
+STATE_FILE = "state.json"
+STATE_FORMAT_VERSION = 1
+
+
+def _sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _message_hash(sender, message):
+    return _sha256(f"{sender}\x00{message}".encode("utf-8"))
+
+
+def chat_bytes(source):
+    """A chat source's text as UTF-8 bytes (zip entry / BOM / UTF-16 decoded)."""
+    with open_chat(source) as f:
+        return f.read().encode("utf-8")
+
+
+def chat_id_for(data):
+    """
+    Stable id for a chat: hash of its first two lines (the creation notice
+    and first message), which every later re-export repeats.
+    """
+    head = [line for line in data[:64 * 1024].splitlines() if line.strip()][:2]
+    return _sha256(b"\n".join(head))[:16]
+
+
+def _starts_with_message(delta):
+    """True when the appended bytes begin with a new message header."""
+    for line in delta.splitlines():
+        line = line.decode("utf-8", errors="replace").strip()
+        if line:
+            return LINE_PATTERN.match(line) is not None
+    return True  # whitespace only
+
+
+# -------------------------------
+# Persistence
+# -------------------------------
+def load_state(chat_id, root=STATE_DIR):
+    """Stored state dict for a chat, or None."""
+    path = os.path.join(root, chat_id, STATE_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        state = json.load(f)
+    if state.get("format_version") != STATE_FORMAT_VERSION:
+        return None
+    return state
+
+
+def _load_outputs(chat_id, state, root):
+    chat_dir = os.path.join(root, chat_id)
+    results = joblib.load(os.path.join(chat_dir, state["results_file"]))
+    profile = joblib.load(os.path.join(chat_dir, state["profile_file"]))
+    return results, profile
+
+
+def _save_state(chat_id, state, results, profile, root):
+    """
+    Write results/profile under a new generation, then swap state.json in
+    atomically; files of older generations are removed afterwards.
+    """
+    chat_dir = os.path.join(root, chat_id)
+    os.makedirs(chat_dir, exist_ok=True)
+    generation = uuid.uuid4().hex[:8]
+    state = dict(state, results_file=f"results-{generation}.pkl",
+                 profile_file=f"profile-{generation}.pkl")
+    joblib.dump(results, os.path.join(chat_dir, state["results_file"]))
+    joblib.dump(profile, os.path.join(chat_dir, state["profile_file"]))
+
+    tmp_path = os.path.join(chat_dir, f".{STATE_FILE}.{generation}")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, os.path.join(chat_dir, STATE_FILE))
+
+    for name in os.listdir(chat_dir):
+        if name.endswith(".pkl") and generation not in name:
+            os.remove(os.path.join(chat_dir, name))
+    return state
+
+
+def _build_state(chat_id, data, results, fmt, model_version):
+    last = results.iloc[-1]
+    return {
+        "format_version": STATE_FORMAT_VERSION,
+        "chat_id": chat_id,
+        "prefix_bytes": len(data),
+        "prefix_sha256": _sha256(data),
+        "datetime_format": fmt,
+        "messages": int(len(results)),
+        "last_message": {
+            "datetime": None if pd.isna(last["datetime"]) else last["datetime"].isoformat(),
+            "sha256": _message_hash(last["sender"], last["message"]),
+        },
+        "model_version": model_version,
+        "updated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+
+
+# -------------------------------
+# Analysis
+# -------------------------------
+def _resume_check(state, data, model_version):
+    """None when the stored state can be extended by `data`, else why not."""
+    if state is None:
+        return "new chat"
+    if state["model_version"] != model_version:
+        return "model changed"
+    prefix = state["prefix_bytes"]
+    if len(data) < prefix or _sha256(data[:prefix]) != state["prefix_sha256"]:
+        return "prefix changed"
+    if not _starts_with_message(data[prefix:]):
+        return "last message changed"
+    return None
+
+
+def analyze_chat(source, chat_id=None, scorer=None, model_version=None, root=STATE_DIR):
+    """
+    Parse, label, score and profile a chat export, reusing the stored state
+    of an earlier export of the same chat when only messages were appended.
+    Returns a dict: chat_id, mode ("full" / "incremental" / "unchanged"),
+    reason (why a full rebuild happened), new_messages, results, profile,
+    timings. Pass `model_version` with a custom `scorer` so stored results
+    are invalidated when that scorer changes.
+    """
+    if scorer is None:
+        scorer, model_version = MODEL_REGISTRY.get_versioned()
+    elif model_version is None:
+        model_version = MODEL_REGISTRY.version
+
+    start = time.perf_counter()
+    data = chat_bytes(source)
+    chat_id = chat_id or chat_id_for(data)
+    state = load_state(chat_id, root)
+    reason = _resume_check(state, data, model_version)
+
+    results = profile = None
+    if reason is None:
+        try:
+            results, profile = _load_outputs(chat_id, state, root)
+            last = results.iloc[-1]
+            if _message_hash(last["sender"], last["message"]) != state["last_message"]["sha256"]:
+                reason = "stored results out of sync"
+        except (OSError, KeyError, IndexError, EOFError):
+            reason = "stored results unreadable"
+    timings = {"check": time.perf_counter() - start}
+
+    pipeline = ChatPipeline(scorer)
+    if reason is None:
+        delta = data[state["prefix_bytes"]:]
+        fmt = state["datetime_format"]
+        mode, new = "unchanged", None
+        if delta.strip():
+            try:
+                new = pipeline.run(delta, datetime_format=fmt)
+            except ValueError:  # only system lines were appended
+                new = None
+        if new is not None:
+            last_seen = state["last_message"]["datetime"]
+            first_new = new["datetime"].dropna()
+            if last_seen and not first_new.empty and first_new.iloc[0] < pd.Timestamp(last_seen):
+                reason = "new messages older than the last known message"
+            else:
+                mode = "incremental"
+                with span("incremental.merge", messages=len(new)):
+                    results = pd.concat([results, new], ignore_index=True)
+                    profile.merge(ChatProfile.from_frame(new))
+        timings.update(pipeline.timings)
+
+    if reason is not None:
+        mode, new = "full", None
+        fmt = sniff_datetime_format(data)
+        results = pipeline.run(data, datetime_format=fmt)
+        timings.update(pipeline.timings)
+        with span("incremental.profile", messages=len(results)):
+            profile = ChatProfile.from_frame(results)
+
+    if mode != "unchanged" or len(data) != state["prefix_bytes"]:
+        _save_state(chat_id, _build_state(chat_id, data, results, fmt, model_version),
+                    results, profile, root)
+    count(f"incremental_{mode}")
+
+    return {
+        "chat_id": chat_id,
+        "mode": mode,
+        "reason": reason,
+        "new_messages": len(results) if mode == "full" else (len(new) if new is not None else 0),
+        "results": results,
+        "profile": profile,
+        "timings": timings,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m src.incremental",
+                                     description="Incrementally re-analyze a re-exported chat.")
+    parser.add_argument("chat", help="WhatsApp .txt or .zip export")
+    parser.add_argument("--chat-id", default=None,
+                        help="state key (default: derived from the chat's first lines)")
+    parser.add_argument("--state-dir", default=STATE_DIR)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    outcome = analyze_chat(args.chat, chat_id=args.chat_id, root=args.state_dir)
+    reason = f" ({outcome['reason']})" if outcome["reason"] else ""
+    print(f"✅ {outcome['chat_id']}: {outcome['mode']}{reason}, "
+          f"{outcome['new_messages']} new / {len(outcome['results'])} total messages "
+          f"in {time.perf_counter() - start:.2f}s")
@@ -0,0 +1,370 @@
+# ================================
+# Pure-NumPy Inference Engine
+# ================================
+# Scores messages with arrays exported from the trained TF-IDF vectorizer
+# and linear model, without importing scikit-learn at serving time.
+
+import itertools
+import re
+import struct
+import numpy as np
+
+# scikit-learn's default token_pattern and a faster equivalent: a greedy
+# run of 2+ word characters always ends on a word boundary anyway
+DEFAULT_TOKEN_PATTERN = r"(?u)\b\w\w+\b"
+_FAST_TOKEN_PATTERN = r"\w\w+"
+
+
+# -------------------------------
+# Shared text preprocessing
+# -------------------------------
+# Run on the training text and on every message before it is scored, so the
+# vectorizer sees the same token distribution in both places. A bundle names
+# its step in the manifest ("preprocess"); bundles without one score raw text.
+_ELONGATED_RE = re.compile(r"(.)\1\1+")  # same as (.)\1{2,}, but faster
+# URLs, digits and punctuation in one pass: removing URLs and digits first
+# and then every other non-letter leaves the same text
+_STRIP_RE = re.compile(r"http\S+|www\S+|[^a-z\s]")
+
+
+def clean_text(text):
+    """Lowercase, reduce elongated letters (freeeee -> free), drop URLs, digits, punctuation."""
+    return _STRIP_RE.sub("", _ELONGATED_RE.sub(r"\1", text.lower()))
+
+
+def clean_texts(messages):
+    """clean_text over a whole batch; returns a list of strings."""
+    elongated, strip = _ELONGATED_RE.sub, _STRIP_RE.sub
+    return [strip("", elongated(r"\1", str(m).lower())) for m in messages]
+
+
+PREPROCESSORS = {"clean_text": clean_texts}
+DEFAULT_PREPROCESS = "clean_text"  # the step train_model.py trains with
+
+
+def get_preprocessor(name):
+    """Batch preprocessing function registered under `name` (None → no-op)."""
+    if name is None:
+        return None
+    try:
+        return PREPROCESSORS[name]
+    except KeyError:
+        raise ValueError(f"Unknown preprocessing step: {name}") from None
+
+
+# -------------------------------
+# Feature hashing (HashingVectorizer-compatible)
+# -------------------------------
+HASH_CACHE_SIZE = 1_000_000  # memoized token → column entries before the memo is reset
+
+
+def murmurhash3_32(data, seed=0):
+    """Signed 32-bit MurmurHash3 (x86) of bytes, equal to sklearn.utils.murmurhash3_32."""
+    c1, c2, mask = 0xCC9E2D51, 0x1B873593, 0xFFFFFFFF
+    h = seed & mask
+    n_body = len(data) - len(data) % 4
+    for (k,) in struct.iter_unpack("<I", data[:n_body]):
+        k = (k * c1) & mask
+        k = ((k << 15) | (k >> 17)) & mask
+        h ^= (k * c2) & mask
+        h = ((h << 13) | (h >> 19)) & mask
+        h = (h * 5 + 0xE6546B64) & mask
+    tail = data[n_body:]
+    if tail:
+        k = int.from_bytes(tail, "little")
+        k = (k * c1) & mask
+        k = ((k << 15) | (k >> 17)) & mask
+        h ^= (k * c2) & mask
+    h ^= len(data)
+    h ^= h >> 16
+    h = (h * 0x85EBCA6B) & mask
+    h ^= h >> 13
+    h = (h * 0xC2B2AE35) & mask
+    h ^= h >> 16
+    return h - (1 << 32) if h & 0x80000000 else h
+
+
+class _HashedColumns(dict):
+    """
+    token → column index + 1 under feature hashing, as HashingVectorizer
+    (alternate_sign=False) assigns it; hashed once per distinct token.
+    """
+
+    def __init__(self, n_features):
+        super().__init__()
+        self.n_features = n_features
+
+    def __missing__(self, token):
+        if len(self) >= HASH_CACHE_SIZE:
+            self.clear()
+        column = abs(murmurhash3_32(token.encode("utf-8"))) % self.n_features + 1
+        self[token] = column
+        return column
+
+
+def linear_weights(model):
+    """(spam-minus-ham weight vector, bias) of a fitted binary linear model."""
+    if list(model.classes_) != [0, 1]:
+        raise ValueError(f"Expected classes [0, 1], got {list(model.classes_)}")
+    if hasattr(model, "feature_log_prob_"):
+        # Naive Bayes: log P(x|spam) - log P(x|ham) and prior difference
+        coef = model.feature_log_prob_[1] - model.feature_log_prob_[0]
+        bias = model.class_log_prior_[1] - model.class_log_prior_[0]
+    else:
+        coef = np.ravel(model.coef_)
+        bias = np.ravel(model.intercept_)[0]
+    return coef, bias
+
+
+def nb_weights(feature_count, class_count, alpha=1.0, seen=None):
+    """
+    (spam-minus-ham weights, bias) straight from MultinomialNB counts, i.e.
+    what linear_weights gives after fit/partial_fit. With a `seen` mask,
+    smoothing covers only those columns and the rest get weight 0.
+    """
+    feature_count = np.asarray(feature_count, dtype=np.float64)
+    if seen is None:
+        seen = np.ones(feature_count.shape[1], dtype=bool)
+    smoothed = feature_count[:, seen] + alpha
+    log_prob = np.log(smoothed) - np.log(smoothed.sum(axis=1, keepdims=True))
+    coef = np.zeros(feature_count.shape[1])
+    coef[seen] = log_prob[1] - log_prob[0]
+    bias = np.log(class_count[1]) - np.log(class_count[0])
+    return coef, bias
+
+
+def smooth_idf(doc_freq, n_docs):
+    """
+    TfidfVectorizer's default (smooth) idf from document frequencies.
+    Columns no training message hit get 0, so unseen tokens are ignored
+    like out-of-vocabulary words (they would otherwise inflate the L2 norm).
+    """
+    idf = np.log((1.0 + n_docs) / (1.0 + doc_freq)) + 1.0
+    idf[doc_freq == 0] = 0.0
+    return idf
+
+
+def naive_bayes_state(model):
+    """
+    Counts a MultinomialNB needs to keep learning, as bundle arrays
+    (empty for other models). See src/feedback.py.
+    """
+    if not hasattr(model, "feature_count_"):
+        return {}
+    return {
+        "class_count": model.class_count_,
+        "feature_count": model.feature_count_,
+        "alpha": np.array([model.alpha], dtype=np.float64),
+    }
+
+
+class LinearScorer:
+    """
+    Array-based equivalent of TfidfVectorizer.transform + model.predict.
+    Scoring is preprocess → tokenize → vocabulary lookup → tf-idf weighting →
+    L2 normalisation → dot product with the spam-minus-ham weight vector + bias.
+    With `n_features` set (and no terms), tokens are feature-hashed into
+    that many columns instead, like HashingVectorizer.
+    """
+
+    def __init__(self, terms, idf, coef, bias, token_pattern=DEFAULT_TOKEN_PATTERN,
+                 ngram_range=(1, 1), stop_words=(), lowercase=True,
+                 binary=False, sublinear_tf=False, norm="l2", preprocess=None,
+                 n_features=None):
+        self.terms = None if terms is None else np.asarray(terms)
+        self.n_features = None if n_features is None else int(n_features)
+        if (self.terms is None) == (self.n_features is None):
+            raise ValueError("Pass either terms (vocabulary) or n_features (hashing)")
+        self.idf = np.asarray(idf, dtype=np.float64)
+        self.coef = np.asarray(coef, dtype=np.float64)
+        self.bias = float(bias)
+        self.token_pattern = token_pattern
+        self.ngram_range = tuple(int(n) for n in ngram_range)
+        self.stop_words = frozenset(stop_words)
+        self.lowercase = bool(lowercase)
+        self.binary = bool(binary)
+        self.sublinear_tf = bool(sublinear_tf)
+        self.norm = norm
+        self.preprocess = preprocess
+        self._preprocess = get_preprocessor(preprocess)
+        self._token_re = re.compile(
+            _FAST_TOKEN_PATTERN if token_pattern == DEFAULT_TOKEN_PATTERN else token_pattern
+        )
+        self._lookup = None
+
+    @property
+    def vocabulary(self):
+        """term → column index + 1 (so 0 means unknown), built on first use."""
+        if self._lookup is None and self.n_features is not None:
+            self._lookup = _HashedColumns(self.n_features)
+        if self._lookup is None:
+            terms = self.terms.tolist()
+            if self.terms.dtype.kind == "S":  # UTF-8 bytes from a bundle
+                terms = [term.decode("utf-8") for term in terms]
+            self._lookup = {term: i for i, term in enumerate(terms, 1)}
+        return self._lookup
+
+    # -------------------------------
+    # Export from scikit-learn
+    # -------------------------------
+    @classmethod
+    def from_sklearn(cls, model, vectorizer, preprocess=None):
+        """
+        Build a scorer from a fitted TfidfVectorizer and binary linear model.
+        `preprocess` names the step the training text went through, if any.
+        """
+        if vectorizer.analyzer != "word" or vectorizer.tokenizer or vectorizer.preprocessor:
+            raise ValueError("Only the default word analyzer can be exported")
+        if vectorizer.norm not in ("l2", None):
+            raise ValueError(f"Unsupported norm: {vectorizer.norm}")
+        coef, bias = linear_weights(model)
+
+        vocab = vectorizer.vocabulary_
+        terms = np.empty(len(vocab), dtype=object)
+        for term, idx in vocab.items():
+            terms[idx] = term
+
+        if vectorizer.use_idf:
+            idf = vectorizer.idf_
+        else:
+            idf = np.ones(len(vocab))
+
+        return cls(
+            terms=terms.astype(str),
+            idf=idf,
+            coef=coef,
+            bias=bias,
+            token_pattern=vectorizer.token_pattern,
+            ngram_range=vectorizer.ngram_range,
+            stop_words=sorted(vectorizer.get_stop_words() or ()),
+            lowercase=vectorizer.lowercase,
+            binary=vectorizer.binary,
+            sublinear_tf=vectorizer.sublinear_tf,
+            norm=vectorizer.norm,
+            preprocess=preprocess,
+        )
+
+    # -------------------------------
+    # Persistence (see src/model_bundle.py)
+    # -------------------------------
+    def to_arrays(self):
+        """Split the scorer into NumPy arrays and a JSON-able config."""
+        arrays = {"idf": self.idf, "coef": self.coef}
+        if self.terms is not None:
+            arrays["terms"] = np.char.encode(self.terms.astype(str), "utf-8")
+        config = {
+            "bias": self.bias,
+            "token_pattern": self.token_pattern,
+            "ngram_range": list(self.ngram_range),
+            "stop_words": sorted(self.stop_words),
+            "lowercase": self.lowercase,
+            "binary": self.binary,
+            "sublinear_tf": self.sublinear_tf,
+            "norm": self.norm,
+            "preprocess": self.preprocess,
+        }
+        if self.n_features is not None:
+            config["n_features"] = self.n_features
+        return arrays, config
+
+    @classmethod
+    def from_arrays(cls, arrays, config):
+        return cls(terms=arrays.get("terms"), idf=arrays["idf"], coef=arrays["coef"], **config)
+
+    # -------------------------------
+    # Scoring
+    # -------------------------------
+    def _analyze(self, doc):
+        """Same token stream as TfidfVectorizer's word analyzer."""
+        if self.lowercase:
+            doc = doc.lower()
+        tokens = self._token_re.findall(doc)
+        if self.stop_words:
+            tokens = [t for t in tokens if t not in self.stop_words]
+        min_n, max_n = self.ngram_range
+        if max_n == 1:
+            return tokens
+        grams = tokens if min_n == 1 else []
+        for n in range(max(min_n, 2), max_n + 1):
+            grams += [" ".join(tokens[i:i + n]) for i in range(len(tokens) - n + 1)]
+        return grams
+
+    def tfidf(self, messages):
+        """
+        The tf-idf matrix TfidfVectorizer.transform would return, as
+        (n_messages, rows, cols, values) with one entry per (message, term).
+        """
+        if self._preprocess is not None:
+            messages = self._preprocess(messages)
+        # Hashed columns exist for every token; a vocabulary maps unknown ones to 0
+        vocabulary = self.vocabulary
+        lookup = vocabulary.get if self.n_features is None else vocabulary.__getitem__
+        doc_ids = [list(filter(None, map(lookup, self._analyze(str(doc)))))
+                   for doc in messages]
+        n_docs = len(doc_ids)
+        lengths = np.fromiter(map(len, doc_ids), dtype=np.int64, count=n_docs)
+
+        if not lengths.any():
+            empty = np.empty(0, dtype=np.int64)
+            return n_docs, empty, empty, np.empty(0)
+
+        docs = np.repeat(np.arange(n_docs, dtype=np.int64), lengths)
+        cols = np.fromiter(itertools.chain.from_iterable(doc_ids), dtype=np.int64,
+                           count=int(lengths.sum())) - 1
+
+        # Term counts per (message, term) pair
+        n_cols = len(self.idf)
+        keys = docs * n_cols + cols
+        keys, tf = np.unique(keys, return_counts=True)
+        rows, cols = np.divmod(keys, n_cols)
+        tf = tf.astype(np.float64)
+        if self.binary:
+            tf[:] = 1.0
+        elif self.sublinear_tf:
+            tf = np.log(tf) + 1.0
+
+        weights = tf * self.idf[cols]
+        if self.norm == "l2":
+            norms = np.sqrt(np.bincount(rows, weights=weights ** 2, minlength=n_docs))
+            norms[norms == 0] = 1.0
+            weights /= norms[rows]
+        return n_docs, rows, cols, weights
+
+    def decision_function(self, messages):
+        """Spam-minus-ham score per message; > 0 means spam."""
+        n_docs, rows, cols, weights = self.tfidf(messages)
+        dots = np.bincount(rows, weights=weights * self.coef[cols], minlength=n_docs)
+        return self.bias + dots
+
+    def score_batch(self, messages):
+        """
+        Returns (labels, spam_probability) arrays for a batch of messages.
+        Labels match model.predict; for Naive Bayes the probability matches
+        predict_proba, for other linear models it is sigmoid(score).
+        """
+        scores = self.decision_function(messages)
+        labels = (scores > 0).astype(np.int64)
+        proba = 1.0 / (1.0 + np.exp(-scores))
+        return labels, proba
+
+
+class SklearnScorer:
+    """score_batch() over a pickled vectorizer + model, for legacy artifacts."""
+
+    def __init__(self, model, vectorizer, preprocess=None):
+        self.model = model
+        self.vectorizer = vectorizer
+        self.preprocess = preprocess
+        self._preprocess = get_preprocessor(preprocess)
+
+    def score_batch(self, messages):
+        messages = list(messages)
+        if self._preprocess is not None:
+            messages = self._preprocess(messages)
+        X_vec = self.vectorizer.transform(messages)
+        labels = np.asarray(self.model.predict(X_vec), dtype=np.int64)
+        if hasattr(self.model, "predict_proba"):
+            proba = self.model.predict_proba(X_vec)[:, 1]
+        else:
+            proba = 1.0 / (1.0 + np.exp(-self.model.decision_function(X_vec)))
+        return labels, proba
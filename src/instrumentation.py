@@ -0,0 +1,195 @@
+# ================================
+# Stage Timing + Counters
+# ================================
+# Off by default. Turn on with SPAM_DETECTOR_INSTRUMENT=1 or enable().
+#
+#   with span("parse", bytes=n) as s:
+#       df = ...
+#       s.set(messages=len(df))
+#   count("uploads")
+#
+# Disabled, span() returns a shared no-op object and count() returns at once.
+# Enabled, records are exported with export_json() (JSON lines) and
+# export_prometheus() (text exposition format).
+
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+ENV_FLAG = "SPAM_DETECTOR_INSTRUMENT"
+METRIC_PREFIX = "spam_detector"
+MAX_RECORDS = 10_000  # most recent spans kept for the JSON log
+
+
+def enabled_by_env():
+    """True if $SPAM_DETECTOR_INSTRUMENT turns instrumentation on for the process."""
+    return os.environ.get(ENV_FLAG, "").strip().lower() not in ("", "0", "false", "no")
+
+
+_enabled = enabled_by_env()
+_lock = threading.Lock()
+_records = deque(maxlen=MAX_RECORDS)
+_stages = {}    # name -> {"calls", "seconds", "messages", "bytes"}
+_counters = {}  # name -> value
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+class _NullSpan:
+    """What span() hands out while disabled: every operation is a no-op."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **fields):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("name", "fields", "_start")
+
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = fields
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self._start
+        record = {"name": self.name, "ts": round(time.time(), 6),
+                  "seconds": round(seconds, 6), **self.fields}
+        if exc_type is not None:
+            record["error"] = exc_type.__name__
+        with _lock:
+            _records.append(record)
+            stage = _stages.setdefault(self.name, {"calls": 0, "seconds": 0.0,
+                                                   "messages": 0, "bytes": 0})
+            stage["calls"] += 1
+            stage["seconds"] += seconds
+            stage["messages"] += int(self.fields.get("messages") or 0)
+            stage["bytes"] += int(self.fields.get("bytes") or 0)
+        return False
+
+    def set(self, **fields):
+        """Attach fields known only once the stage is done (e.g. messages)."""
+        self.fields.update(fields)
+
+
+def span(name, **fields):
+    """Context manager timing one run of a stage; `messages` / `bytes` fields are summed."""
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name, fields)
+
+
+def count(name, value=1):
+    """Add `value` to a named counter."""
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def instrumented(name):
+    """
+    Decorator form of span(name). When the first argument has a length
+    (a DataFrame of messages) it is recorded as `messages`.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            fields = {}
+            if args and hasattr(args[0], "__len__"):
+                fields["messages"] = len(args[0])
+            with _Span(name, fields):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# -------------------------------
+# Reading + export
+# -------------------------------
+def snapshot():
+    """Copy of the per-stage totals, counters and recent span records."""
+    with _lock:
+        return {
+            "stages": {name: dict(stage) for name, stage in _stages.items()},
+            "counters": dict(_counters),
+            "records": list(_records),
+        }
+
+
+def reset():
+    with _lock:
+        _records.clear()
+        _stages.clear()
+        _counters.clear()
+
+
+def export_json(path):
+    """Append the recorded spans to `path` as JSON lines and drain them."""
+    with _lock:
+        records = list(_records)
+        _records.clear()
+    with open(path, "a", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    return len(records)
+
+
+def _metric_name(name):
+    return "".join(c if c.isalnum() else "_" for c in name).lower()
+
+
+def prometheus_text():
+    """Per-stage totals and counters in the Prometheus text exposition format."""
+    snap = snapshot()
+    lines = []
+    for field, help_text in (("calls", "Stage runs"), ("seconds", "Time spent in the stage"),
+                             ("messages", "Messages processed by the stage"),
+                             ("bytes", "Bytes processed by the stage")):
+        metric = f"{METRIC_PREFIX}_stage_{field}_total"
+        lines += [f"# HELP {metric} {help_text}.", f"# TYPE {metric} counter"]
+        for name, stage in sorted(snap["stages"].items()):
+            label = name.replace("\\", "\\\\").replace('"', '\\"')
+            lines.append(f'{metric}{{stage="{label}"}} {stage[field]}')
+    for name, value in sorted(snap["counters"].items()):
+        metric = f"{METRIC_PREFIX}_{_metric_name(name)}_total"
+        lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+    return "\n".join(lines) + "\n"
+
+
+def export_prometheus(path):
+    """Write prometheus_text() to `path` atomically (textfile-collector friendly)."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(prometheus_text())
+    os.replace(tmp_path, path)
@@ -0,0 +1,223 @@
+# ================================
+# Versioned Model Bundle
+# ================================
+# models/bundles/<version>/manifest.json  version, data hash, metrics, config
+# models/bundles/<version>/<array>.npy    memory-mappable scorer arrays
+# models/bundles/LATEST                   name of the current version
+
+import datetime
+import hashlib
+import json
+import os
+import shutil
+import uuid
+
+import numpy as np
+
+from src.inference import DEFAULT_PREPROCESS, LinearScorer, naive_bayes_state
+
+BUNDLE_FORMAT_VERSION = 1
+# Anchored on the repo root so CLIs work from any directory
+MODELS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models")
+BUNDLE_ROOT = os.path.join(MODELS_DIR, "bundles")
+LATEST_FILE = "LATEST"
+MANIFEST_FILE = "manifest.json"
+
+
+def file_sha256(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def new_version():
+    """Sortable, unique version name: UTC timestamp + random suffix."""
+    stamp = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    return f"{stamp}-{uuid.uuid4().hex[:8]}"
+
+
+class ModelBundle:
+    """
+    A model version on disk. Only the manifest is read on open; each array
+    is checksum-verified and memory-mapped on first access, so processes
+    that load the same bundle share one copy of its pages.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        manifest_path = os.path.join(path, MANIFEST_FILE)
+        if not os.path.exists(manifest_path):
+            raise FileNotFoundError(f"No model bundle at: {path}")
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("format_version") != BUNDLE_FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported bundle format {self.manifest.get('format_version')} at {path}"
+            )
+        self._arrays = {}
+        self._scorer = None
+
+    @property
+    def version(self):
+        return self.manifest["model_version"]
+
+    @property
+    def metrics(self):
+        return self.manifest.get("metrics", {})
+
+    def array(self, name):
+        """Verify (once) and memory-map one of the bundle's arrays."""
+        if name not in self._arrays:
+            entry = self.manifest["arrays"][name]
+            array_path = os.path.join(self.path, entry["file"])
+            if file_sha256(array_path) != entry["sha256"]:
+                raise ValueError(f"Checksum mismatch for {array_path}; bundle is corrupt")
+            self._arrays[name] = np.load(array_path, mmap_mode="r")
+        return self._arrays[name]
+
+    def scorer(self):
+        """LinearScorer backed by the memory-mapped arrays."""
+        if self._scorer is None:
+            # "terms" is absent from feature-hashing bundles
+            arrays = {name: self.array(name) for name in ("terms", "idf", "coef")
+                      if name in self.manifest["arrays"]}
+            self._scorer = LinearScorer.from_arrays(arrays, self.manifest["scorer"])
+        return self._scorer
+
+
+def latest_version(root=BUNDLE_ROOT):
+    """Version named in root/LATEST, or None if nothing was published."""
+    try:
+        with open(os.path.join(root, LATEST_FILE), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def load_bundle(root=BUNDLE_ROOT, version=None):
+    """Open a bundle version (the published LATEST one by default)."""
+    version = version or latest_version(root)
+    if version is None:
+        raise FileNotFoundError(f"No model bundle published in: {root}")
+    return ModelBundle(os.path.join(root, version))
+
+
+def trained_bundle(root=BUNDLE_ROOT):
+    """
+    The trained bundle behind LATEST: LATEST itself, or, when LATEST came
+    from reviewer-feedback updates (src/feedback.py), the bundle they were
+    applied to. Its metrics are the last ones measured on the hold-out.
+    """
+    bundle = load_bundle(root)
+    while "updated_from" in bundle.metrics:
+        bundle = load_bundle(root, bundle.metrics.get("trained_from", bundle.metrics["updated_from"]))
+    return bundle
+
+
+def write_bundle(scorer, root=BUNDLE_ROOT, metrics=None, training_data=None,
+                 extra_arrays=None, publish=True):
+    """
+    Write scorer arrays + manifest as a new version and (by default) publish
+    it as LATEST. The version directory is renamed into place and LATEST is
+    swapped with os.replace, so readers never see a half-written bundle.
+    Returns the new version name.
+    """
+    version = new_version()
+    os.makedirs(root, exist_ok=True)
+    staging = os.path.join(root, f".tmp-{version}")
+    os.makedirs(staging)
+
+    try:
+        arrays, config = scorer.to_arrays()
+        arrays.update(extra_arrays or {})
+        entries = {}
+        for name, values in arrays.items():
+            file_name = f"{name}.npy"
+            array_path = os.path.join(staging, file_name)
+            values = np.ascontiguousarray(values)
+            np.save(array_path, values, allow_pickle=False)
+            entries[name] = {
+                "file": file_name,
+                "sha256": file_sha256(array_path),
+                "dtype": values.dtype.str,
+                "shape": list(values.shape),
+            }
+
+        manifest = {
+            "format_version": BUNDLE_FORMAT_VERSION,
+            "model_version": version,
+            "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "training_data_sha256": file_sha256(training_data) if training_data else None,
+            "metrics": metrics or {},
+            "scorer": config,
+            "arrays": entries,
+        }
+        with open(os.path.join(staging, MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+
+        os.rename(staging, os.path.join(root, version))
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    if publish:
+        publish_version(version, root)
+    return version
+
+
+def publish_version(version, root=BUNDLE_ROOT):
+    """Atomically point LATEST at an existing version."""
+    if not os.path.exists(os.path.join(root, version, MANIFEST_FILE)):
+        raise FileNotFoundError(f"No model bundle version: {version}")
+    tmp_path = os.path.join(root, f".{LATEST_FILE}.{uuid.uuid4().hex}")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(tmp_path, os.path.join(root, LATEST_FILE))
+
+
+def _read_manifest(root, version):
+    with open(os.path.join(root, version, MANIFEST_FILE), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def prune_versions(keep=(), root=BUNDLE_ROOT, before=None, where=None):
+    """
+    Delete bundle versions other than LATEST and those in `keep`. With
+    `where`, only versions whose manifest satisfies where(manifest) are
+    deleted. With `before`, only versions created before that one are, so
+    a bundle another process has written but not yet published is left
+    alone. Returns the deleted versions.
+    """
+    keep = set(keep) | {latest_version(root)}
+    cutoff = _read_manifest(root, before)["created_at"] if before else None
+    removed = []
+    for version in sorted(os.listdir(root)):
+        if version in keep or version.startswith("."):
+            continue
+        try:
+            manifest = _read_manifest(root, version)
+            created_at = manifest["created_at"]
+        except (OSError, ValueError, KeyError):
+            continue  # not a bundle version
+        if cutoff is not None and created_at >= cutoff:
+            continue
+        if where is None or where(manifest):
+            shutil.rmtree(os.path.join(root, version), ignore_errors=True)
+            removed.append(version)
+    return removed
+
+
+if __name__ == "__main__":
+    # Convert the legacy joblib pickles into a published bundle
+    import joblib
+
+    model = joblib.load(os.path.join(MODELS_DIR, "spam_model.pkl"))
+    vectorizer = joblib.load(os.path.join(MODELS_DIR, "vectorizer.pkl"))
+    version = write_bundle(
+        LinearScorer.from_sklearn(model, vectorizer, preprocess=DEFAULT_PREPROCESS),
+        training_data=os.path.join(os.path.dirname(MODELS_DIR), "data", "spam.csv"),
+        extra_arrays=naive_bayes_state(model),
+    )
+    print(f"✅ Model bundle {version} published in {BUNDLE_ROOT}/")
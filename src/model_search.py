@@ -0,0 +1,306 @@
+# ================================
+# Cross-validated Model Search
+# ================================
+# python src/train_model.py --search [--folds 5] [--jobs -1] [--publish]
+#
+# Grid-searches vectorizer and classifier settings with stratified k-fold CV
+# on the training split (the 20% test split train_model.py holds out is not
+# touched). Each fold's fitted TfidfVectorizer and feature matrices are
+# cached on disk with joblib.Memory, so every classifier sharing a
+# vectorizer setting reuses them instead of re-tokenizing the corpus.
+# The leaderboard is ranked by CV spam F1 and lists precision / recall
+# next to the per-message latency of the exported serving scorer.
+# --publish only replaces the LATEST bundle with a model at least as good
+# on the hold-out split as the last trained bundle.
+
+import argparse
+import hashlib
+import itertools
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from joblib import Memory, Parallel, delayed
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import accuracy_score, f1_score, precision_score, recall_score
+from sklearn.model_selection import StratifiedKFold, train_test_split
+from sklearn.naive_bayes import MultinomialNB
+from sklearn.svm import LinearSVC
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.inference import DEFAULT_PREPROCESS, LinearScorer, clean_texts, linear_weights, naive_bayes_state
+from src.model_bundle import MODELS_DIR, trained_bundle, write_bundle
+from src.train_model import load_external_dataset
+
+DATASET_PATH = os.path.join(os.path.dirname(MODELS_DIR), "data", "spam.csv")
+CACHE_DIR = os.path.join(os.path.dirname(MODELS_DIR), "data", "model_search_cache")
+STOP_WORDS = sorted(TfidfVectorizer(stop_words="english").get_stop_words())
+
+# -------------------------------
+# Search space
+# -------------------------------
+VECTORIZER_GRID = {
+    "ngram_range": [(1, 1), (1, 2)],
+    "min_df": [1, 2],
+    "sublinear_tf": [False, True],
+}
+CLASSIFIER_GRID = {
+    "MultinomialNB": (MultinomialNB, {"alpha": [0.1, 0.3, 1.0]}),
+    "LinearSVC": (LinearSVC, {"C": [0.1, 1.0]}),
+    "LogisticRegression": (LogisticRegression, {"C": [1.0, 10.0], "max_iter": [1000]}),
+}
+
+
+def _expand(grid):
+    """Every combination of a {param: [values]} grid as a list of dicts."""
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*grid.values())]
+
+
+def search_space():
+    """(vectorizer params, classifier name, classifier params) for every grid point."""
+    classifiers = [(name, params) for name, (_, grid) in CLASSIFIER_GRID.items()
+                   for params in _expand(grid)]
+    return [(vec, name, params) for vec in _expand(VECTORIZER_GRID) for name, params in classifiers]
+
+
+def _describe(vec_params, clf_params):
+    params = {**vec_params, **clf_params}
+    params.pop("max_iter", None)
+    return ", ".join(f"{k}={v}" for k, v in params.items())
+
+
+# -------------------------------
+# Cached fold features
+# -------------------------------
+def corpus_key(texts, labels):
+    """Digest of the corpus; the cache is keyed on it instead of hashing every text per call."""
+    digest = hashlib.sha256()
+    for text, label in zip(texts, labels):
+        digest.update(f"{label}\x00{text}\x01".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _vectorize_fold(corpus, texts, labels, fold, n_folds, vec_params):
+    """
+    Fit the vectorizer on one CV fold. Returns plain arrays, which load
+    fast from the cache: (X_train, X_test, test_idx, terms, idf).
+    """
+    splitter = StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=42)
+    train_idx, test_idx = list(splitter.split(texts, labels))[fold]
+    vectorizer = TfidfVectorizer(stop_words="english", **vec_params)
+    X_train = vectorizer.fit_transform([texts[i] for i in train_idx])
+    X_test = vectorizer.transform([texts[i] for i in test_idx])
+    return X_train, X_test, test_idx, vectorizer.get_feature_names_out().astype(str), vectorizer.idf_
+
+
+def fold_features(cache_dir, corpus, texts, labels, fold, n_folds, vec_params):
+    """_vectorize_fold through the on-disk joblib.Memory cache (keyed on `corpus`)."""
+    memory = Memory(cache_dir, verbose=0)
+    cached = memory.cache(_vectorize_fold, ignore=["texts", "labels"])
+    return cached(corpus, texts, labels, fold, n_folds, vec_params)
+
+
+# -------------------------------
+# One grid point on one fold
+# -------------------------------
+def _latency_us(scorer, messages, repeat=3):
+    """Best-of-`repeat` microseconds per message for scorer.score_batch (serving path)."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        scorer.score_batch(messages)
+        best = min(best, time.perf_counter() - start)
+    return best / len(messages) * 1e6
+
+
+def evaluate(cache_dir, corpus, texts, raw, labels, fold, n_folds,
+             vec_params, clf_name, clf_params):
+    """Fit and score one grid point on one fold; latency is timed on fold 0 only."""
+    X_train, X_test, test_idx, terms, idf = fold_features(
+        cache_dir, corpus, texts, labels, fold, n_folds, vec_params
+    )
+    y = np.asarray(labels)
+    start = time.perf_counter()
+    model = CLASSIFIER_GRID[clf_name][0](**clf_params).fit(X_train, np.delete(y, test_idx))
+    fit_seconds = time.perf_counter() - start
+
+    y_true, y_pred = y[test_idx], model.predict(X_test)
+    result = {
+        "fold": fold,
+        "precision": precision_score(y_true, y_pred, zero_division=0),
+        "recall": recall_score(y_true, y_pred),
+        "f1": f1_score(y_true, y_pred),
+        "accuracy": accuracy_score(y_true, y_pred),
+        "fit_seconds": fit_seconds,
+        "n_features": len(terms),
+        "latency_us": np.nan,
+    }
+    if fold == 0:
+        # Raw messages through the scorer the bundle would serve: preprocessing included
+        coef, bias = linear_weights(model)
+        scorer = LinearScorer(terms, idf, coef, bias, stop_words=STOP_WORDS,
+                              ngram_range=vec_params["ngram_range"],
+                              sublinear_tf=vec_params["sublinear_tf"],
+                              preprocess=DEFAULT_PREPROCESS)
+        result["latency_us"] = _latency_us(scorer, [raw[i] for i in test_idx])
+    return result
+
+
+# -------------------------------
+# Search
+# -------------------------------
+def training_split(dataset_path=DATASET_PATH):
+    """The same 80/20 split as train_model.main: (raw train, raw test, y train, y test)."""
+    df = load_external_dataset(dataset_path)
+    return train_test_split(df["message"].astype(str), df["label"],
+                            test_size=0.2, random_state=42, stratify=df["label"])
+
+
+def run_search(raw, labels, n_folds=5, n_jobs=-1, cache_dir=CACHE_DIR):
+    """
+    Cross-validate every grid point in parallel; returns the leaderboard
+    DataFrame, best first (spam F1, then precision, then latency).
+    Ranking by precision alone would favour models that flag almost
+    nothing.
+    """
+    raw = list(raw)
+    labels = [int(label) for label in labels]
+    texts = clean_texts(raw)
+    corpus = corpus_key(texts, labels)
+    grid = search_space()
+    vec_settings = _expand(VECTORIZER_GRID)
+    parallel = Parallel(n_jobs=n_jobs)
+
+    # 1) Fill the feature cache once per (vectorizer setting, fold)
+    start = time.perf_counter()
+    parallel(delayed(fold_features)(cache_dir, corpus, texts, labels, fold, n_folds, vec)
+             for vec in vec_settings for fold in range(n_folds))
+    print(f"🧮 {len(vec_settings) * n_folds} fold feature matrices ready "
+          f"in {time.perf_counter() - start:.1f}s ({cache_dir})")
+
+    # 2) Every grid point on every fold, reading the cached features
+    start = time.perf_counter()
+    tasks = [(point, fold) for point in range(len(grid)) for fold in range(n_folds)]
+    results = parallel(
+        delayed(evaluate)(cache_dir, corpus, texts, raw, labels, fold, n_folds, *grid[point])
+        for point, fold in tasks
+    )
+    print(f"🔍 {len(tasks)} fits ({len(grid)} settings × {n_folds} folds) "
+          f"in {time.perf_counter() - start:.1f}s")
+
+    rows = pd.DataFrame(results)
+    rows["point"] = [point for point, _ in tasks]
+    board = rows.groupby("point").agg(
+        precision=("precision", "mean"),
+        precision_std=("precision", "std"),
+        recall=("recall", "mean"),
+        recall_std=("recall", "std"),
+        f1=("f1", "mean"),
+        accuracy=("accuracy", "mean"),
+        fit_seconds=("fit_seconds", "mean"),
+        latency_us=("latency_us", "max"),
+        n_features=("n_features", "mean"),
+    )
+    board["n_features"] = board["n_features"].round().astype(int)
+    board.insert(0, "model", [grid[p][1] for p in board.index])
+    board.insert(1, "params", [_describe(grid[p][0], grid[p][2]) for p in board.index])
+    board = board.sort_values(["f1", "precision", "latency_us"],
+                              ascending=[False, False, True]).reset_index()
+    board.index = board.index + 1
+    board.index.name = "rank"
+    return board
+
+
+def holdout_f1(metrics):
+    """Spam F1 from a bundle's hold-out metrics; None if they are not recorded."""
+    precision, recall = metrics.get("spam_precision"), metrics.get("spam_recall")
+    if precision is None or recall is None:
+        return None
+    return 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+
+
+def publish_best(board, raw_train, y_train, raw_test, y_test, force=False):
+    """
+    Refit the top grid point on the training split, evaluate on the
+    hold-out and publish it. Unless `force`, a model with a lower hold-out
+    F1 than the last trained bundle (LATEST, before any feedback updates)
+    is not published; returns the version or None.
+    """
+    vec_params, clf_name, clf_params = search_space()[board.iloc[0]["point"]]
+    vectorizer = TfidfVectorizer(stop_words="english", **vec_params)
+    model = CLASSIFIER_GRID[clf_name][0](**clf_params)
+    model.fit(vectorizer.fit_transform(clean_texts(raw_train)), y_train)
+
+    scorer = LinearScorer.from_sklearn(model, vectorizer, preprocess=DEFAULT_PREPROCESS)
+    y_pred, _ = scorer.score_batch(raw_test)
+    metrics = {
+        "accuracy": accuracy_score(y_test, y_pred),
+        "spam_precision": precision_score(y_test, y_pred, zero_division=0),
+        "spam_recall": recall_score(y_test, y_pred),
+        "test_size": int(len(y_test)),
+        "model": clf_name,
+        "params": _describe(vec_params, clf_params),
+    }
+    summary = (f"{clf_name} ({metrics['params']}): hold-out precision "
+               f"{metrics['spam_precision']:.3f}, recall {metrics['spam_recall']:.3f}")
+
+    try:
+        current = trained_bundle()
+    except FileNotFoundError:
+        current = None
+    baseline = holdout_f1(current.metrics) if current else None
+    if not force and baseline is not None and holdout_f1(metrics) < baseline:
+        print(f"⛔ Not published. {summary}, F1 {holdout_f1(metrics):.3f} is below "
+              f"F1 {baseline:.3f} of the trained bundle {current.version} (--force to publish anyway)")
+        return None
+
+    version = write_bundle(scorer, metrics=metrics, training_data=DATASET_PATH,
+                           extra_arrays=naive_bayes_state(model))
+    print(f"✅ {summary}; published as bundle {version}")
+    return version
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python src/train_model.py --search",
+        description="Cross-validated search over vectorizer and classifier settings.",
+    )
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("-j", "--jobs", type=int, default=-1,
+                        help="parallel workers (default: all cores)")
+    parser.add_argument("-o", "--output", default="leaderboard.csv",
+                        help="leaderboard CSV (default: %(default)s)")
+    parser.add_argument("--top", type=int, default=15, help="rows to print")
+    parser.add_argument("--cache-dir", default=CACHE_DIR,
+                        help="joblib.Memory cache of fold features (default: %(default)s)")
+    parser.add_argument("--publish", action="store_true",
+                        help="refit the best setting and publish it as the LATEST bundle")
+    parser.add_argument("--force", action="store_true",
+                        help="with --publish, publish even if the last trained bundle "
+                             "scores better on the hold-out")
+    args = parser.parse_args(argv)
+
+    raw_train, raw_test, y_train, y_test = training_split()
+    board = run_search(raw_train, y_train, n_folds=args.folds, n_jobs=args.jobs,
+                       cache_dir=args.cache_dir)
+    board.drop(columns="point").to_csv(args.output)
+
+    columns = ["model", "params", "precision", "recall", "f1", "latency_us", "n_features"]
+    with pd.option_context("display.width", 200, "display.max_columns", None,
+                           "display.max_colwidth", 60, "display.float_format", "{:.4f}".format):
+        print(f"\n🏆 Leaderboard ({args.folds}-fold CV, top {args.top}):\n")
+        print(board[columns].head(args.top))
+    print(f"\n💾 Full leaderboard written to {args.output}")
+
+    if args.publish:
+        publish_best(board, raw_train.tolist(), y_train, raw_test.tolist(), y_test,
+                     force=args.force)
+    return board
+
+
+if __name__ == "__main__":
+    main()
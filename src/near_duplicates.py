@@ -0,0 +1,147 @@
+# ================================
+# Near-duplicate Clustering (MinHash + LSH)
+# ================================
+# Spam campaigns repeat one template with small edits (names, amounts,
+# links). Messages are reduced to word sets (links and numbers folded),
+# MinHash-signed and bucketed with LSH as they stream in; a message joins
+# the LSH candidate cluster whose representative's signature agrees best.
+# The model then scores one message per cluster and the rest inherit it.
+
+import re
+import zlib
+
+import numpy as np
+
+URL_PATTERN = re.compile(r"https?://\S+|www\.\S+")
+NUMBER_PATTERN = re.compile(r"\d+")
+WORD_PATTERN = re.compile(r"\w+")
+
+MAX_HASH = (1 << 32) - 1
+SIGNATURE_BATCH = 4096  # messages hashed per vectorized step
+MIN_WORDS = 5  # shorter word sets only cluster with identical ones
+
+
+def shingle_key(text):
+    """
+    Word set of a message, as a sorted string, with links and numbers
+    folded so template copies that only differ there share one key. The
+    model is bag-of-words, so messages with the same word set get (nearly)
+    the same prediction anyway.
+    """
+    text = URL_PATTERN.sub(" url ", str(text).lower())
+    text = NUMBER_PATTERN.sub("0", text)
+    return " ".join(sorted(set(WORD_PATTERN.findall(text))))
+
+
+class NearDuplicateIndex:
+    """
+    Streaming MinHash/LSH index. add(messages) returns a cluster id per
+    message, stable across calls, so chunks of one chat share clusters.
+    Messages with an already seen word set join that cluster directly; new
+    word sets are MinHash-signed and join the first LSH candidate cluster
+    whose representative agrees on at least `threshold` of the signature
+    (the estimated Jaccard similarity), else start a cluster of their own.
+    """
+
+    def __init__(self, num_perm=64, bands=16, threshold=0.7, seed=1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        rng = np.random.RandomState(seed)
+        # Multiply-shift hashing: odd 64-bit multipliers, top 32 bits kept
+        self._a = rng.randint(0, 1 << 63, size=num_perm, dtype=np.uint64) * 2 + 1
+        self._b = rng.randint(0, 1 << 63, size=num_perm, dtype=np.uint64)
+        self._band_mix = rng.randint(0, 1 << 63, size=self.rows, dtype=np.uint64) * 2 + 1
+
+        self._clusters = {}                        # shingle key -> cluster id
+        self._buckets = [{} for _ in range(bands)]  # per band: {band hash: cluster id}
+        self._reps = np.empty((1024, num_perm), dtype=np.uint32)  # representative signatures
+        self.n_clusters = 0
+        self.cluster_scores = {}                   # cluster id -> (label, proba) once scored
+
+    def signatures(self, keys):
+        """MinHash signatures of shingle keys, shape (len(keys), num_perm), uint32."""
+        out = np.full((len(keys), self.num_perm), MAX_HASH, dtype=np.uint32)
+        for start in range(0, len(keys), SIGNATURE_BATCH):
+            words = [key.split() for key in keys[start:start + SIGNATURE_BATCH]]
+            lengths = np.fromiter(map(len, words), dtype=np.int64, count=len(words))
+            if not lengths.any():
+                continue
+            hashes = np.fromiter(
+                (zlib.crc32(w.encode("utf-8")) for ws in words for w in ws),
+                dtype=np.uint64, count=int(lengths.sum()),
+            )
+            # h_i(x) = top 32 bits of (a_i * x + b_i) mod 2**64, then min per message
+            hashed = ((hashes[:, None] * self._a + self._b) >> np.uint64(32)).astype(np.uint32)
+            nonempty = np.flatnonzero(lengths)
+            offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))[nonempty]
+            out[start + nonempty] = np.minimum.reduceat(hashed, offsets, axis=0)
+        return out
+
+    def _band_hashes(self, sigs):
+        """One 64-bit hash per (signature, band), as nested Python lists."""
+        bands = sigs.reshape(len(sigs), self.bands, self.rows).astype(np.uint64)
+        return (bands * self._band_mix).sum(axis=2).tolist()
+
+    def _add_representative(self, sig):
+        if self.n_clusters == len(self._reps):  # grow the signature matrix geometrically
+            self._reps = np.vstack([self._reps, np.empty_like(self._reps)])
+        self._reps[self.n_clusters] = sig
+        self.n_clusters += 1
+        return self.n_clusters - 1
+
+    def add(self, messages):
+        """Assign each message to a cluster (new or existing); returns int64 ids."""
+        messages = list(messages)
+        key_of = {m: shingle_key(m) for m in dict.fromkeys(messages)}  # verbatim repeats once
+        keys = [key_of[m] for m in messages]
+        new_keys = list(dict.fromkeys(k for k in keys if k not in self._clusters))
+        if new_keys:
+            sigs = self.signatures(new_keys)
+            min_agree = self.threshold * self.num_perm
+            for key, sig, bands in zip(new_keys, sigs, self._band_hashes(sigs)):
+                if key.count(" ") + 1 < MIN_WORDS:  # too short for similarity to mean much
+                    self._clusters[key] = self._add_representative(sig)
+                    continue
+                candidates = {buckets[band] for buckets, band in zip(self._buckets, bands)
+                              if band in buckets}
+                cluster = -1
+                if candidates:
+                    candidates = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+                    agree = np.count_nonzero(self._reps[candidates] == sig, axis=1)
+                    if agree.max() >= min_agree:
+                        cluster = int(candidates[agree.argmax()])
+                if cluster < 0:
+                    cluster = self._add_representative(sig)
+                    for buckets, band in zip(self._buckets, bands):
+                        buckets.setdefault(band, cluster)
+                self._clusters[key] = cluster
+        return np.fromiter((self._clusters[k] for k in keys), dtype=np.int64, count=len(keys))
+
+    def score(self, messages, cluster_ids, scorer):
+        """
+        (labels, proba) for `messages` with one score_batch call covering only
+        clusters not scored before; other members inherit their cluster's result.
+        """
+        todo = {}
+        for i, cluster in enumerate(cluster_ids.tolist()):
+            if cluster not in self.cluster_scores and cluster not in todo:
+                todo[cluster] = i
+        if todo:
+            labels, proba = scorer.score_batch([messages[i] for i in todo.values()])
+            self.cluster_scores.update(zip(todo, zip(labels.tolist(), proba.tolist())))
+        scores = [self.cluster_scores[c] for c in cluster_ids.tolist()]
+        labels = np.fromiter((s[0] for s in scores), dtype=np.int64, count=len(scores))
+        proba = np.fromiter((s[1] for s in scores), dtype=np.float64, count=len(scores))
+        return labels, proba
+
+
+def cluster_sizes(cluster_ids):
+    """Size of each message's cluster, aligned with `cluster_ids`."""
+    cluster_ids = np.asarray(cluster_ids, dtype=np.int64)
+    if not cluster_ids.size:
+        return cluster_ids
+    return np.bincount(cluster_ids)[cluster_ids]
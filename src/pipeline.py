@@ -0,0 +1,67 @@
+# ================================
+# Single-pass Chat Pipeline
+# ================================
+
+import time
+from contextlib import contextmanager
+
+from src.data_preprocessing import load_chat
+from src.instrumentation import span
+from src.Labelling import auto_label
+from src.near_duplicates import NearDuplicateIndex, cluster_sizes
+from src.predict import apply_model, clean_messages
+
+
+class ChatPipeline:
+    """
+    Parses, labels and scores a chat exactly once.
+    After run(), `results` holds the one DataFrame every dashboard section
+    reads from, and `timings` maps each stage name to seconds taken.
+    With near_duplicates=True the score stage clusters near-duplicate
+    messages (cluster_id / cluster_size) and scores each cluster once.
+    """
+
+    def __init__(self, scorer, parse_workers=None, near_duplicates=False):
+        self.scorer = scorer
+        self.parse_workers = parse_workers
+        self.near_duplicates = near_duplicates
+        self.results = None
+        self.timings = {}
+
+    @contextmanager
+    def _stage(self, name):
+        start = time.perf_counter()
+        try:
+            with span(f"pipeline.{name}"):
+                yield
+        finally:
+            self.timings[name] = time.perf_counter() - start
+
+    def run(self, source, datetime_format=None):
+        """
+        Run parse → label → score on a chat (path, bytes, buffer or file
+        object; see data_preprocessing.open_chat) and return the results.
+        """
+        self.timings = {}
+
+        with self._stage("parse"):
+            df = clean_messages(load_chat(source, workers=self.parse_workers,
+                                          datetime_format=datetime_format))
+        if df.empty:
+            raise ValueError("No messages loaded. Check your WhatsApp chat format.")
+
+        with self._stage("label"):
+            df = auto_label(df)
+
+        with self._stage("score"):
+            clusters = NearDuplicateIndex() if self.near_duplicates else None
+            df = apply_model(df, self.scorer, clusters)
+            if clusters is not None:
+                df["cluster_size"] = cluster_sizes(df["cluster_id"])
+
+        self.results = df
+        return df
+
+    @property
+    def total_time(self):
+        return sum(self.timings.values())
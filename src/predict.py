@@ -1,22 +1,117 @@
 import os
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import threading
+import time
 import joblib
+import numpy as np
 import pandas as pd
-from src.data_preprocessing import load_chat
-from src.Labelling import auto_label
+from src.data_preprocessing import iter_chat, source_size
+from src.instrumentation import is_enabled, span
+from src.Labelling import SPAM_MATCHER, auto_label
+from src.inference import DEFAULT_PREPROCESS, SklearnScorer
+from src.model_bundle import MODELS_DIR, latest_version, load_bundle
+from src.near_duplicates import NearDuplicateIndex, cluster_sizes
+from src.prediction_cache import wrap_scorer
 
-def load_model():
+def load_model(version=None):
     """
-    Load trained model and vectorizer from models/ folder
+    Load the published model bundle (or a given version) from models/bundles/
+    (memory-mapped, checksum-verified). Falls back to the legacy joblib pickles.
+    Returns a scorer with score_batch(messages) -> (labels, proba)
     """
-    model_path = os.path.join("models", "spam_model.pkl")
-    vec_path = os.path.join("models", "vectorizer.pkl")
+    try:
+        return load_bundle(version=version).scorer()
+    except FileNotFoundError:
+        model = joblib.load(os.path.join(MODELS_DIR, "spam_model.pkl"))
+        vectorizer = joblib.load(os.path.join(MODELS_DIR, "vectorizer.pkl"))
+        # The pickles come from train_model.py, trained on preprocessed text
+        return SklearnScorer(model, vectorizer, preprocess=DEFAULT_PREPROCESS)
 
-    model = joblib.load(model_path)
-    vectorizer = joblib.load(vec_path)
 
-    return model, vectorizer
+def model_version():
+    """
+    Identify the model on disk: the published bundle version, or the
+    legacy artifacts' size and mtime
+    """
+    version = latest_version()
+    if version is not None:
+        return version
+    parts = []
+    for name in ("spam_model.pkl", "vectorizer.pkl"):
+        stat = os.stat(os.path.join(MODELS_DIR, name))
+        parts.append(f"{name}:{stat.st_size}:{stat.st_mtime_ns}")
+    return "|".join(parts)
+
+
+class ModelRegistry:
+    """
+    Process-wide holder of the current scorer.
+    The model is loaded once on first use and shared by every caller.
+    get() checks the model version on disk at most every `check_interval`
+    seconds and atomically swaps in a newer artifact without a restart.
+    A scorer passed to inject() is used as-is and never reloaded.
+    With $SPAM_DETECTOR_PREDICTION_CACHE set, loaded scorers consult the
+    persistent prediction cache first (see src.prediction_cache).
+    """
+
+    def __init__(self, check_interval=5.0):
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._current = None  # (scorer, version) swapped as one tuple
+        self._injected = False
+        self._last_check = 0.0
+
+    @property
+    def version(self):
+        current = self._current
+        return current[1] if current else None
+
+    def get(self):
+        """Return the current scorer, loading or hot-reloading it if needed."""
+        return self.get_versioned()[0]
+
+    def get_versioned(self):
+        """Return (scorer, version) from the same consistent snapshot."""
+        current = self._current
+        if current is not None and (
+            self._injected or time.monotonic() - self._last_check < self.check_interval
+        ):
+            return current
+
+        with self._lock:
+            if self._injected:
+                return self._current
+            self._last_check = time.monotonic()
+            version = model_version()
+            if self._current is None or self._current[1] != version:
+                # Pin the bundle version just read; legacy pickles have none
+                scorer = load_model(version if latest_version() == version else None)
+                # Behind the on-disk prediction cache when one is configured
+                self._current = (wrap_scorer(scorer, version), version)
+            return self._current
+
+    def inject(self, scorer, version="injected"):
+        """Use an already-loaded scorer (e.g. the app's) instead of disk."""
+        with self._lock:
+            self._current = (scorer, version)
+            self._injected = True
+
+    def reset(self):
+        """Drop the loaded/injected scorer; the next get() loads from disk."""
+        with self._lock:
+            self._current = None
+            self._injected = False
+            self._last_check = 0.0
+
+
+MODEL_REGISTRY = ModelRegistry()
+
+
+def get_model():
+    """Current scorer from the process-wide MODEL_REGISTRY."""
+    return MODEL_REGISTRY.get()
+
 
 def clean_messages(df):
     """
@@ -28,42 +123,124 @@ def clean_messages(df):
     return df
 
 
-def predict_chat(file_path):
+def rule_hits(messages):
+    """Bool array: True for messages the keyword rule stage marks as Spam."""
+    return np.fromiter(map(bool, SPAM_MATCHER.find_all(messages)), dtype=bool,
+                       count=len(messages))
+
+
+def _score_stages(messages, hits, scorer, clusters=None, cluster_ids=None):
     """
-    Predict spam/ham for messages inside a WhatsApp chat file
+    Model stage for the messages the rule stage did not flag.
+    Returns (labels, proba); rule hits are Spam with probability 1.0.
+    With a NearDuplicateIndex, one message per cluster is scored and the
+    other members inherit its label
     """
-    # Load WhatsApp chat
-    df = load_chat(file_path)
-    df = clean_messages(df)
+    labels = hits.astype(np.int64)
+    proba = hits.astype(np.float64)
+    rest = np.flatnonzero(~hits)
+    if rest.size:  # Only if there are messages left to predict
+        with span("model", messages=int(rest.size)):
+            if clusters is None:
+                labels[rest], proba[rest] = scorer.score_batch(messages[rest])
+            else:
+                labels[rest], proba[rest] = clusters.score(messages[rest], cluster_ids[rest], scorer)
+    return labels, proba
 
-    if df.empty:
-        raise ValueError("No messages loaded. Check your WhatsApp chat format.")
 
-    # Auto-label obvious spam keywords
-    df = auto_label(df)
+def score_messages(messages, *, return_proba=False, scorer=None):
+    """
+    Classify raw message strings in memory: no file, no DataFrames.
+    Runs the keyword rule stage, then the model on the remaining messages.
+    Returns (labels, rule_hits), or (labels, proba, rule_hits) with
+    return_proba=True; labels are 1 = Spam / 0 = Ham, rule_hits is a bool array
+    """
+    scorer = scorer or get_model()
+    messages = np.array(["" if m is None else str(m) for m in messages], dtype=object)
+    with span("rules", messages=len(messages)):
+        hits = rule_hits(messages)
 
-    # Load trained model + vectorizer
-    model, vectorizer = load_model()
+    labels, proba = _score_stages(messages, hits, scorer)
+    if return_proba:
+        return labels, proba, hits
+    return labels, hits
 
-    #  Predict messages that are NOT auto-labeled as spam
-    df["prediction"] = "Spam"
-    mask = ~df['auto_spam']
-    if mask.any():  # Only if there are messages left to predict
-        X_vec = vectorizer.transform(df.loc[mask, "message"])
-        predictions = pd.Series(model.predict(X_vec), index=df.index[mask])
-        df.loc[mask, "prediction"] = predictions.map({0: "Ham", 1: "Spam"})
+
+def apply_model(df, scorer, clusters=None):
+    """
+    Score auto-labelled messages with the model and set final_prediction.
+    Pass a NearDuplicateIndex to also set cluster_id and score each
+    near-duplicate cluster once
+    """
+    cluster_ids = None
+    if clusters is not None:
+        with span("near_duplicates", messages=len(df)):
+            cluster_ids = clusters.add(df["message"].tolist())
+        df["cluster_id"] = cluster_ids
+    labels, _ = _score_stages(df["message"].to_numpy(dtype=object),
+                              df["auto_spam"].to_numpy(dtype=bool), scorer,
+                              clusters, cluster_ids)
+    # Auto-labelled rows stay "Spam"; the rest carry the model's prediction
+    df["prediction"] = np.where(labels == 1, "Spam", "Ham")
 
     # Combine auto-labeled spam and model predictions
-    df['final_prediction'] = df.apply(
-        lambda row: "Spam" if row['auto_spam'] else row['prediction'], axis=1
-    )
+    df['final_prediction'] = np.where(df['auto_spam'], "Spam", df['prediction'])
 
     return df
 
 
+def predict_chunk(df, scorer, clusters=None):
+    """
+    Predict spam/ham for one chat DataFrame (or streamed chunk of one)
+    """
+    df = clean_messages(df)
+    if df.empty:
+        return df
+
+    # Auto-label obvious spam keywords
+    with span("rules", messages=len(df)):
+        df = auto_label(df)
+    return apply_model(df, scorer, clusters)
+
+
+def predict_chat(source, scorer=None, near_duplicates=False):
+    """
+    Predict spam/ham for messages inside a WhatsApp chat: a file path, or
+    the export's bytes / memoryview / file object (see open_chat).
+    The chat is streamed in chunks so labelling and scoring start
+    before the whole file has been parsed.
+    With near_duplicates=True, messages are grouped into near-duplicate
+    clusters as they stream in (cluster_id and cluster_size columns) and
+    the model scores one message per cluster
+    """
+    # Shared, already-loaded model unless the caller passes one
+    scorer = scorer or get_model()
+    clusters = NearDuplicateIndex() if near_duplicates else None
+
+    with span("predict_chat") as stage:
+        if is_enabled():
+            stage.set(bytes=source_size(source))
+        chunks = [predict_chunk(chunk, scorer, clusters) for chunk in iter_chat(source)]
+        chunks = [chunk for chunk in chunks if not chunk.empty]
+
+        if not chunks:
+            raise ValueError("No messages loaded. Check your WhatsApp chat format.")
+
+        results = pd.concat(chunks, ignore_index=True)
+        if clusters is not None:
+            results["cluster_size"] = cluster_sizes(results["cluster_id"])
+        stage.set(messages=len(results))
+    return results
+
+
 if __name__ == "__main__":
-    test_file = os.path.join("data", "temp_chat.txt")
-    results = predict_chat(test_file)
+    if len(sys.argv) > 1:
+        # Batch mode: python -m src.predict <dirs|globs|files> [--output ...]
+        from src.batch import main
+        main()
+    else:
+        test_file = os.path.join("data", "temp_chat.txt")
+        results = predict_chat(test_file)
 
-    print("Predictions on WhatsApp chat:")
-    print(results[["sender", "message", "final_prediction"]].tail(20))  # last 20 messages
+        print("Predictions on WhatsApp chat:")
+        print(results[["sender", "message", "final_prediction"]].tail(20))  # last 20 messages
@@ -0,0 +1,227 @@
+# ================================
+# Persistent Prediction Cache (SQLite)
+# ================================
+# SPAM_DETECTOR_PREDICTION_CACHE=data/prediction_cache.sqlite3 streamlit run app.py
+# python -m src.prediction_cache [--clear]   # row counts per model version
+#
+# Forwarded spam repeats verbatim across chats. Predictions are stored under
+# (model version, hash of the normalized message) so a repeated message skips
+# vectorizing and classification entirely.
+
+import argparse
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from src.model_bundle import MODELS_DIR
+
+CACHE_ENV = "SPAM_DETECTOR_PREDICTION_CACHE"
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(MODELS_DIR), "data", "prediction_cache.sqlite3")
+DEFAULT_MAX_ENTRIES = 1_000_000
+SQL_BATCH = 500  # keys per IN (...) query, below SQLite's variable limit
+TOUCH_INTERVAL = 3600  # seconds; LRU recency is only refreshed this coarsely
+
+
+def normalize_message(text):
+    """
+    Case and whitespace are folded: the vectorizer lowercases and splits on
+    non-word characters, so such variants always get the same prediction.
+    """
+    return " ".join(str(text).split()).lower()
+
+
+def message_key(text):
+    return hashlib.blake2b(normalize_message(text).encode("utf-8"), digest_size=16).digest()
+
+
+class PredictionCache:
+    """
+    (model_version, message hash) → (label, spam probability) in SQLite.
+    get_many/put_many work on whole batches; once the table holds more than
+    `max_entries` rows the least recently used tenth is evicted.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS predictions ("
+            " model_version TEXT NOT NULL,"
+            " message_hash BLOB NOT NULL,"
+            " label INTEGER NOT NULL,"
+            " proba REAL NOT NULL,"
+            " last_used INTEGER NOT NULL,"
+            " PRIMARY KEY (model_version, message_hash)) WITHOUT ROWID"
+        )
+        self._conn.commit()
+        self._rows = self._conn.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+
+    def get_many(self, model_version, keys):
+        """{key: (label, proba)} for the keys already cached under this model version."""
+        found, stale = {}, []
+        keys = list(keys)
+        now = int(time.time())
+        with self._lock:
+            for i in range(0, len(keys), SQL_BATCH):
+                batch = keys[i:i + SQL_BATCH]
+                rows = self._conn.execute(
+                    "SELECT message_hash, label, proba, last_used FROM predictions "
+                    f"WHERE model_version = ? AND message_hash IN ({','.join('?' * len(batch))})",
+                    [model_version, *batch],
+                ).fetchall()
+                found.update((key, (label, proba)) for key, label, proba, _ in rows)
+                stale += [key for key, _, _, last_used in rows if last_used < now - TOUCH_INTERVAL]
+            if stale:
+                # Rewriting recency on every hit would cost more than the lookup
+                self._conn.executemany(
+                    "UPDATE predictions SET last_used = ? WHERE model_version = ? AND message_hash = ?",
+                    [(now, model_version, key) for key in stale],
+                )
+                self._conn.commit()
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, model_version, items):
+        """Store (key, label, proba) triples; evicts old rows past max_entries."""
+        now = int(time.time())
+        rows = [(model_version, key, int(label), float(proba), now) for key, label, proba in items]
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO predictions (model_version, message_hash, label, proba, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._rows += self._conn.total_changes - before
+            if self._rows > self.max_entries:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """
+        Drop the least recently used rows down to 90% of max_entries.
+        last_used has no index: an occasional scan here is cheaper than
+        maintaining one on every insert.
+        """
+        excess = self._rows - int(self.max_entries * 0.9)
+        self._conn.execute(
+            "DELETE FROM predictions WHERE (model_version, message_hash) IN ("
+            " SELECT model_version, message_hash FROM predictions ORDER BY last_used LIMIT ?)",
+            (excess,),
+        )
+        self.evictions += excess
+        self._rows = self._conn.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+
+    @property
+    def hit_ratio(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "rows": self._rows,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hit_ratio, 4),
+            "evictions": self.evictions,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM predictions")
+            self._conn.commit()
+            self._rows = 0
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class CachedScorer:
+    """
+    score_batch() through a PredictionCache: repeated messages (within the
+    batch or seen before under the same model version) are not re-scored.
+    """
+
+    def __init__(self, scorer, cache, model_version):
+        self.scorer = scorer
+        self.cache = cache
+        self.model_version = model_version
+
+    def __getattr__(self, name):
+        return getattr(self.scorer, name)
+
+    def score_batch(self, messages):
+        messages = list(messages)
+        keys = [message_key(m) for m in messages]
+        first = {}
+        for i, key in enumerate(keys):
+            first.setdefault(key, i)
+
+        known = self.cache.get_many(self.model_version, first)
+        missing = [key for key in first if key not in known]
+        if missing:
+            labels, proba = self.scorer.score_batch([messages[first[key]] for key in missing])
+            new = list(zip(missing, labels.tolist(), proba.tolist()))
+            self.cache.put_many(self.model_version, new)
+            known.update((key, (label, p)) for key, label, p in new)
+
+        labels = np.fromiter((known[key][0] for key in keys), dtype=np.int64, count=len(keys))
+        proba = np.fromiter((known[key][1] for key in keys), dtype=np.float64, count=len(keys))
+        return labels, proba
+
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def cache_from_env():
+    """The process-wide PredictionCache at $SPAM_DETECTOR_PREDICTION_CACHE, or None."""
+    path = os.environ.get(CACHE_ENV)
+    if not path:
+        return None
+    with _shared_lock:
+        if path not in _shared:
+            _shared[path] = PredictionCache(path)
+        return _shared[path]
+
+
+def wrap_scorer(scorer, model_version):
+    """Wrap a freshly loaded scorer in CachedScorer when a cache is configured."""
+    cache = cache_from_env()
+    return CachedScorer(scorer, cache, model_version) if cache is not None else scorer
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m src.prediction_cache",
+                                     description="Inspect or clear the prediction cache.")
+    parser.add_argument("--path", default=os.environ.get(CACHE_ENV) or DEFAULT_CACHE_PATH)
+    parser.add_argument("--clear", action="store_true", help="delete every cached prediction")
+    args = parser.parse_args()
+
+    cache = PredictionCache(args.path)
+    if args.clear:
+        cache.clear()
+        print(f"🧹 Cleared {args.path}")
+    versions = cache._conn.execute(
+        "SELECT model_version, COUNT(*) FROM predictions GROUP BY model_version"
+    ).fetchall()
+    print(f"📦 {args.path}: {cache.stats()['rows']} cached predictions")
+    for version, rows in versions:
+        print(f"   {version}: {rows}")
@@ -0,0 +1,280 @@
+# ================================
+# Local Scoring Service (asyncio)
+# ================================
+# python -m src.service --port 8765
+#
+#   POST /score       {"messages": ["...", ...]}  → per-message predictions
+#   POST /score_chat  raw .txt / .zip export body → per-message predictions
+#   GET  /metrics     latency percentiles, batch sizes, queue depth
+#   GET  /health
+#
+# Concurrent requests are collected into micro-batches so every batch
+# makes a single model call.
+
+import argparse
+import asyncio
+import json
+import time
+from collections import deque
+
+import numpy as np
+
+from src.data_preprocessing import load_chat
+from src.predict import MODEL_REGISTRY, clean_messages, rule_hits
+
+MAX_BODY_BYTES = 64 * 1024 * 1024
+LATENCY_WINDOW = 10_000  # requests kept for percentile metrics
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found",
+           405: "Method Not Allowed", 413: "Payload Too Large",
+           500: "Internal Server Error"}
+
+
+class MicroBatcher:
+    """
+    Collects messages from concurrent requests into one model call.
+    A batch is closed when it reaches `max_batch_size` messages or when
+    `max_wait_ms` has passed since its first request arrived.
+    """
+
+    def __init__(self, max_batch_size=256, max_wait_ms=5.0):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = asyncio.Queue()
+        self.batches = 0
+        self.batched_messages = 0
+
+    @property
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    async def submit(self, messages):
+        """Score a list of messages; resolves to (labels, proba) arrays."""
+        if not messages:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((messages, future))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            size = len(batch[0][0])
+            deadline = loop.time() + self.max_wait
+            while size < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                size += len(item[0])
+
+            messages = [m for msgs, _ in batch for m in msgs]
+            try:
+                # One model call per batch, off the event loop (get() may reload the bundle)
+                labels, proba = await loop.run_in_executor(
+                    None, lambda: MODEL_REGISTRY.get().score_batch(messages)
+                )
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.batched_messages += len(messages)
+            start = 0
+            for msgs, future in batch:
+                end = start + len(msgs)
+                if not future.done():
+                    future.set_result((labels[start:end], proba[start:end]))
+                start = end
+
+
+class ScoringService:
+    """HTTP front end over a MicroBatcher, with latency bookkeeping."""
+
+    def __init__(self, max_batch_size=256, max_wait_ms=5.0):
+        self.batcher = MicroBatcher(max_batch_size, max_wait_ms)
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.requests = 0
+        self.errors = 0
+
+    # -------------------------------
+    # Endpoints
+    # -------------------------------
+    async def score(self, messages):
+        """
+        Rule stage + batched model stage for a list of messages, with the
+        semantics of predict.score_messages: only messages without a rule
+        hit reach the model; rule hits are Spam with probability 1.0.
+        """
+        messages = ["" if m is None else str(m) for m in messages]
+        hits = await asyncio.get_running_loop().run_in_executor(None, rule_hits, messages)
+        labels = hits.astype(np.int64)
+        proba = hits.astype(np.float64)
+        rest = np.flatnonzero(~hits)
+        if rest.size:
+            labels[rest], proba[rest] = await self.batcher.submit([messages[i] for i in rest])
+        return [
+            {
+                "message": message,
+                "auto_spam": bool(hit),
+                "prediction": "Spam" if label else "Ham",
+                "final_prediction": "Spam" if label else "Ham",
+                "spam_probability": round(float(p), 6),
+            }
+            for message, hit, label, p in zip(messages, hits, labels, proba)
+        ]
+
+    async def score_chat(self, body):
+        loop = asyncio.get_running_loop()
+        df = await loop.run_in_executor(None, lambda: clean_messages(load_chat(body)))
+        records = await self.score(df["message"].tolist())
+        for record, sender, dt in zip(records, df["sender"], df["datetime"]):
+            record["sender"] = sender
+            record["datetime"] = None if dt is None or dt != dt else dt.isoformat()
+        return records
+
+    def metrics(self):
+        latencies = np.array(self.latencies) * 1000.0
+        cache = getattr(MODEL_REGISTRY.get(), "cache", None)
+        batches = self.batcher.batches
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "queue_depth": self.batcher.queue_depth,
+            "batches": batches,
+            "avg_batch_size": round(self.batcher.batched_messages / batches, 2) if batches else 0.0,
+            "latency_ms": {
+                "p50": round(float(np.percentile(latencies, 50)), 3) if len(latencies) else None,
+                "p99": round(float(np.percentile(latencies, 99)), 3) if len(latencies) else None,
+                "window": len(latencies),
+            },
+            "model_version": MODEL_REGISTRY.version,
+            "prediction_cache": cache.stats() if cache is not None else None,
+        }
+
+    # -------------------------------
+    # HTTP plumbing
+    # -------------------------------
+    async def dispatch(self, method, path, body):
+        if path == "/health":
+            return 200, {"status": "ok"}
+        if path == "/metrics":
+            return 200, self.metrics()
+        if path not in ("/score", "/score_chat"):
+            return 404, {"error": f"Unknown path: {path}"}
+        if method != "POST":
+            return 405, {"error": "Use POST"}
+
+        start = time.perf_counter()
+        self.requests += 1
+        try:
+            if path == "/score":
+                payload = json.loads(body or b"{}")
+                messages = payload.get("messages") if isinstance(payload, dict) else payload
+                if not isinstance(messages, list):
+                    raise ValueError('Body must be {"messages": [...]} or a JSON list')
+                result = {"results": await self.score(messages)}
+            else:
+                result = {"results": await self.score_chat(body)}
+        except ValueError as e:  # includes JSONDecodeError and parse errors
+            self.errors += 1
+            return 400, {"error": str(e)}
+        except Exception as e:
+            self.errors += 1
+            return 500, {"error": str(e)}
+        self.latencies.append(time.perf_counter() - start)
+        return 200, result
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, _ = request_line.decode("latin-1").split(" ", 2)
+                except ValueError:
+                    await self._respond(writer, 400, {"error": "Malformed request line"}, False)
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                content_length = headers.get("content-length") or "0"
+                if not content_length.isdecimal():
+                    # Without a valid length the body cannot be skipped, so close
+                    await self._respond(writer, 400, {"error": "Invalid Content-Length"}, False)
+                    break
+                length = int(content_length)
+                keep_alive = headers.get("connection", "").lower() != "close"
+                if length > MAX_BODY_BYTES:
+                    await self._respond(writer, 413, {"error": "Body too large"}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                status, payload = await self.dispatch(method.upper(), target.split("?", 1)[0], body)
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _respond(writer, status, payload, keep_alive):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        head = (
+            f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            "Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+
+async def serve(host="127.0.0.1", port=8765, max_batch_size=256, max_wait_ms=5.0):
+    service = ScoringService(max_batch_size, max_wait_ms)
+    MODEL_REGISTRY.get()  # load before accepting traffic
+    batch_task = asyncio.create_task(service.batcher.run())
+    server = await asyncio.start_server(service.handle_connection, host, port)
+    print(f"🚀 Scoring service on http://{host}:{port} "
+          f"(max batch {max_batch_size}, max wait {max_wait_ms} ms)")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        batch_task.cancel()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m src.service",
+                                     description="Local spam scoring service.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--max-batch-size", type=int, default=256,
+                        help="messages per model call (default: %(default)s)")
+    parser.add_argument("--max-wait-ms", type=float, default=5.0,
+                        help="max time a request waits for its batch to fill (default: %(default)s)")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, args.max_batch_size, args.max_wait_ms))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+# ================================
+# Out-of-core Training (feature hashing + partial_fit)
+# ================================
+# python src/train_model.py --stream corpus.jsonl [--chunk-size 100000] [--n-features 1048576]
+#
+# Trains on labelled corpora too large for memory. The corpus (tab-separated
+# label/message like data/spam.csv, or JSONL with "label" and "message") is
+# read in chunks and hashed into a fixed number of columns, so memory does
+# not grow with the vocabulary. Pass 1 counts document frequencies for the
+# idf, pass 2 partial_fits MultinomialNB on tf-idf features, pass 3 scores
+# the hold-out rows. The result is a regular model bundle: LinearScorer
+# hashes tokens the same way, so serving code is unchanged.
+
+import argparse
+import os
+import sys
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.naive_bayes import MultinomialNB
+from sklearn.preprocessing import normalize
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.inference import (DEFAULT_PREPROCESS, LinearScorer, clean_texts, naive_bayes_state,
+                           nb_weights, smooth_idf)
+from src.model_bundle import write_bundle
+
+DEFAULT_N_FEATURES = 2 ** 20
+DEFAULT_CHUNK_SIZE = 100_000
+DEFAULT_TEST_PERCENT = 20
+LABELS = {"ham": 0, "spam": 1, "0": 0, "1": 1}
+
+
+# -------------------------------
+# Chunked corpus reading
+# -------------------------------
+def iter_labelled_chunks(path, chunk_size=DEFAULT_CHUNK_SIZE, sep="\t", encoding="utf-8"):
+    """
+    Yield (messages, labels) per chunk of a labelled corpus: .jsonl/.json
+    lines with "label" and "message", otherwise headerless `sep`-separated
+    label/message rows. Labels are ham/spam or 0/1; other rows are dropped.
+    """
+    if path.endswith((".jsonl", ".json")):
+        reader = pd.read_json(path, lines=True, chunksize=chunk_size, dtype=False,
+                              encoding=encoding)
+    else:
+        reader = pd.read_csv(path, sep=sep, header=None, names=["label", "message"],
+                             usecols=[0, 1], dtype=str, chunksize=chunk_size,
+                             encoding=encoding, encoding_errors="replace",
+                             on_bad_lines="skip")
+    for chunk in reader:
+        labels = chunk["label"].astype(str).str.strip().str.lower().map(LABELS)
+        keep = labels.notna() & chunk["message"].notna()
+        if keep.any():
+            yield chunk.loc[keep, "message"].astype(str).tolist(), labels[keep].to_numpy(np.int64)
+
+
+def is_test(messages, test_percent=DEFAULT_TEST_PERCENT):
+    """
+    Deterministic hold-out membership by message content (crc32), so a
+    message and its duplicates always land on the same side of the split.
+    """
+    return np.fromiter((zlib.crc32(m.encode("utf-8")) % 100 < test_percent for m in messages),
+                       dtype=bool, count=len(messages))
+
+
+# -------------------------------
+# Hashed tf-idf features
+# -------------------------------
+def hashing_vectorizer(n_features=DEFAULT_N_FEATURES):
+    """Raw term counts in hashed columns; same tokens as the TF-IDF training path."""
+    return HashingVectorizer(n_features=n_features, stop_words="english",
+                             alternate_sign=False, norm=None)
+
+
+def tfidf_features(vectorizer, messages, idf):
+    counts = vectorizer.transform(clean_texts(messages))
+    return normalize(counts.multiply(idf).tocsr(), norm="l2", copy=False)
+
+
+# -------------------------------
+# Training
+# -------------------------------
+def train_stream(path, chunk_size=DEFAULT_CHUNK_SIZE, n_features=DEFAULT_N_FEATURES,
+                 test_percent=DEFAULT_TEST_PERCENT, sep="\t", encoding="utf-8", alpha=1.0):
+    """
+    Three passes over the corpus with memory bounded by chunk_size and
+    n_features. Returns (model, scorer, metrics, state); `state` holds the
+    document frequencies and Naive Bayes counts needed to resume training.
+    """
+    vectorizer = hashing_vectorizer(n_features)
+
+    def chunks():
+        return iter_labelled_chunks(path, chunk_size, sep, encoding)
+
+    # Pass 1: document frequencies over the training rows
+    start = time.perf_counter()
+    doc_freq = np.zeros(n_features, dtype=np.int64)
+    n_docs = 0
+    for messages, _ in chunks():
+        train = [m for m, test in zip(messages, is_test(messages, test_percent)) if not test]
+        counts = vectorizer.transform(clean_texts(train))
+        doc_freq += np.bincount(counts.indices, minlength=n_features)  # one entry per (doc, term)
+        n_docs += len(train)
+    if not n_docs:
+        raise ValueError(f"No labelled training rows found in {path}")
+    idf = smooth_idf(doc_freq, n_docs)
+    print(f"  ▶ pass 1: {n_docs} training messages, document frequencies "
+          f"in {time.perf_counter() - start:.1f}s")
+
+    # Pass 2: incremental Naive Bayes on tf-idf features
+    start = time.perf_counter()
+    model = MultinomialNB(alpha=alpha)
+    for messages, labels in chunks():
+        train = ~is_test(messages, test_percent)
+        if train.any():
+            X = tfidf_features(vectorizer, [m for m, t in zip(messages, train) if t], idf)
+            model.partial_fit(X, labels[train], classes=[0, 1])
+    print(f"  ▶ pass 2: partial_fit in {time.perf_counter() - start:.1f}s")
+
+    # Smoothing over the seen columns only: spread over all n_features empty
+    # hashed columns, alpha would drown the evidence of the real terms
+    coef, bias = nb_weights(model.feature_count_, model.class_count_, alpha, seen=doc_freq > 0)
+    scorer = LinearScorer(None, idf, coef, bias, stop_words=sorted(vectorizer.get_stop_words()),
+                          preprocess=DEFAULT_PREPROCESS, n_features=n_features)
+
+    # Pass 3: hold-out evaluation through the serving scorer
+    start = time.perf_counter()
+    tp = fp = fn = tn = 0
+    for messages, labels in chunks():
+        test = is_test(messages, test_percent)
+        if test.any():
+            predicted, _ = scorer.score_batch([m for m, t in zip(messages, test) if t])
+            actual = labels[test]
+            tp += int(((predicted == 1) & (actual == 1)).sum())
+            fp += int(((predicted == 1) & (actual == 0)).sum())
+            fn += int(((predicted == 0) & (actual == 1)).sum())
+            tn += int(((predicted == 0) & (actual == 0)).sum())
+    n_test = tp + fp + fn + tn
+    print(f"  ▶ pass 3: {n_test} hold-out messages scored in {time.perf_counter() - start:.1f}s")
+
+    metrics = {
+        "accuracy": (tp + tn) / n_test if n_test else None,
+        "spam_precision": tp / (tp + fp) if tp + fp else None,
+        "spam_recall": tp / (tp + fn) if tp + fn else None,
+        "test_size": n_test,
+        "train_size": n_docs,
+        "confusion_matrix": [[tn, fp], [fn, tp]],
+    }
+    state = {
+        "doc_freq": doc_freq,
+        "n_docs": np.array([n_docs], dtype=np.int64),
+        **naive_bayes_state(model),
+    }
+    return model, scorer, metrics, state
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python src/train_model.py --stream",
+        description="Out-of-core training with feature hashing and partial_fit.",
+    )
+    parser.add_argument("corpus", help="labelled .jsonl, or label<sep>message rows (like data/spam.csv)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--n-features", type=int, default=DEFAULT_N_FEATURES,
+                        help="hashed feature columns (default: %(default)s)")
+    parser.add_argument("--test-percent", type=int, default=DEFAULT_TEST_PERCENT)
+    parser.add_argument("--sep", default="\t", help="column separator for non-JSONL input")
+    parser.add_argument("--encoding", default="utf-8")
+    parser.add_argument("--alpha", type=float, default=1.0, help="Naive Bayes smoothing")
+    parser.add_argument("--no-publish", action="store_true",
+                        help="write the bundle without making it LATEST")
+    args = parser.parse_args(argv)
+
+    print(f"Streaming training corpus: {os.path.abspath(args.corpus)}")
+    _, scorer, metrics, state = train_stream(
+        args.corpus, chunk_size=args.chunk_size, n_features=args.n_features,
+        test_percent=args.test_percent, sep=args.sep, encoding=args.encoding, alpha=args.alpha,
+    )
+    print(f"\n📊 Hold-out ({metrics['test_size']} messages): accuracy {metrics['accuracy']}, "
+          f"spam precision {metrics['spam_precision']}, recall {metrics['spam_recall']}")
+    print(f"📊 Confusion Matrix: {metrics['confusion_matrix']}")
+
+    version = write_bundle(scorer, metrics=metrics, training_data=args.corpus,
+                           extra_arrays=state, publish=not args.no_publish)
+    print(f"✅ Model bundle {version} written to models/bundles/"
+          + ("" if args.no_publish else " and published"))
+    return version
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,18 @@
 import os
-import re
+import sys
 import joblib
 import pandas as pd
 from sklearn.model_selection import train_test_split
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.naive_bayes import MultinomialNB
 from sklearn.metrics import classification_report, confusion_matrix
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.inference import DEFAULT_PREPROCESS, LinearScorer, clean_text, clean_texts, naive_bayes_state
+from src.model_bundle import write_bundle
+
+# Vocabulary pruning level of the shipped model, as (method, level) of
+# src/vocab_pruning.py; picked with `--prune`. (None, None) keeps every term.
+SHIPPED_PRUNING = ("min_df", 2)
+
 
 # 🔹 Load and clean external dataset (UCI SMS Spam Collection)
 def load_external_dataset(path):
@@ -41,15 +47,29 @@ def load_external_dataset(path):
     return df
 
 
-# 🔹 Preprocessing function
+# 🔹 Preprocessing (the scorers apply the same step before serving)
 def preprocess(text):
-    text = text.lower()
-    # Reduce elongated letters: freeeee -> free
-    text = re.sub(r'(.)\1{2,}', r'\1', text)
-    # Remove URLs, numbers, punctuation
-    text = re.sub(r'http\S+|www\S+|\d+', '', text)
-    text = re.sub(r'[^a-z\s]', '', text)
-    return text
+    """Lowercase, reduce elongated letters, remove URLs, numbers, punctuation."""
+    return clean_text(text)
+
+
+def save_model(model, vectorizer, metrics, dataset_path):
+    """Save the pickles and publish the matching model bundle; returns the bundle version."""
+    model_dir = os.path.join(os.path.dirname(__file__), "..", "models")
+    os.makedirs(model_dir, exist_ok=True)
+    joblib.dump(model, os.path.join(model_dir, "spam_model.pkl"))
+    joblib.dump(vectorizer, os.path.join(model_dir, "vectorizer.pkl"))
+    print(f"\n✅ Model and vectorizer saved in {model_dir}/")
+
+    version = write_bundle(
+        LinearScorer.from_sklearn(model, vectorizer, preprocess=DEFAULT_PREPROCESS),
+        root=os.path.join(model_dir, "bundles"),
+        metrics=metrics,
+        training_data=dataset_path,
+        extra_arrays=naive_bayes_state(model),  # lets src/feedback.py keep updating it
+    )
+    print(f"✅ Model bundle {version} published in {model_dir}/bundles/")
+    return version
 
 
 def main():
@@ -63,8 +83,8 @@ def main():
             f"Label unique values: {df['label'].unique()}"
         )
 
-    # 2️⃣ Preprocess
-    X = df['message'].astype(str).apply(preprocess)
+    # 2️⃣ Preprocess: recorded in the bundle so serving applies it too
+    X = pd.Series(clean_texts(df['message'].astype(str)), index=df.index)
     y = df['label']
 
     # 3️⃣ Train-test split
@@ -72,27 +92,40 @@ def main():
         X, y, test_size=0.2, random_state=42, stratify=y
     )
 
-    # 4️⃣ Vectorize
-    vectorizer = TfidfVectorizer(stop_words='english')
-    X_train_vec = vectorizer.fit_transform(X_train)
+    # 4️⃣ Vectorize + 5️⃣ Train model, at the shipped vocabulary pruning level
+    from src.vocab_pruning import fit_pruned, pruning_name
+    vectorizer, model = fit_pruned(X_train, y_train, *SHIPPED_PRUNING)
     X_test_vec = vectorizer.transform(X_test)
 
-    # 5️⃣ Train model
-    model = MultinomialNB()
-    model.fit(X_train_vec, y_train)
-
     # 6️⃣ Evaluate
     y_pred = model.predict(X_test_vec)
     print("\n📊 Classification Report:\n", classification_report(y_test, y_pred))
     print("\n📊 Confusion Matrix:\n", confusion_matrix(y_test, y_pred))
 
-    # 7️⃣ Save model + vectorizer
-    model_dir = os.path.join(os.path.dirname(__file__), "..", "models")
-    os.makedirs(model_dir, exist_ok=True)
-    joblib.dump(model, os.path.join(model_dir, "spam_model.pkl"))
-    joblib.dump(vectorizer, os.path.join(model_dir, "vectorizer.pkl"))
-    print(f"\n✅ Model and vectorizer saved in {model_dir}/")
+    # 7️⃣ Save model + vectorizer, publish the versioned bundle used for serving
+    report = classification_report(y_test, y_pred, output_dict=True)
+    metrics = {
+        "accuracy": report["accuracy"],
+        "spam_precision": report["1"]["precision"],
+        "spam_recall": report["1"]["recall"],
+        "test_size": int(len(y_test)),
+        "pruning": pruning_name(*SHIPPED_PRUNING),
+    }
+    save_model(model, vectorizer, metrics, dataset_path)
 
 
 if __name__ == "__main__":
-    main()
+    if sys.argv[1:2] == ["--search"]:
+        # Cross-validated search: python src/train_model.py --search [options]
+        from src.model_search import main as search
+        search(sys.argv[2:])
+    elif sys.argv[1:2] == ["--prune"]:
+        # Vocabulary pruning report: python src/train_model.py --prune [options]
+        from src.vocab_pruning import main as prune
+        prune(sys.argv[2:])
+    elif sys.argv[1:2] == ["--stream"]:
+        # Out-of-core training: python src/train_model.py --stream corpus.jsonl [options]
+        from src.stream_training import main as stream
+        stream(sys.argv[2:])
+    else:
+        main()
@@ -0,0 +1,252 @@
+# ================================
+# Vocabulary Pruning Report
+# ================================
+# python src/train_model.py --prune [--methods chi2 mutual_info min_df max_features] [--publish]
+#
+# Retrains the production model (TF-IDF + MultinomialNB on train_model.py's
+# 80/20 split) at several pruning levels: the k terms with the highest
+# chi-squared or mutual-information score, min_df, or max_features. Each
+# level reports artifact size, load time, transform throughput and
+# hold-out metrics. Levels are compared on a validation split carved from
+# the training data: the smallest one that keeps the full vocabulary's
+# validation precision and recall is marked, and --publish ships it. The
+# hold-out is only reported, never used to choose. Retraining with
+# train_model.py uses SHIPPED_PRUNING, so update it after publishing a new level.
+
+import argparse
+import os
+import pickle
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.feature_selection import chi2, mutual_info_classif
+from sklearn.metrics import accuracy_score, precision_score, recall_score
+from sklearn.model_selection import train_test_split
+from sklearn.naive_bayes import MultinomialNB
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.inference import DEFAULT_PREPROCESS, LinearScorer, clean_texts
+from src.model_bundle import load_bundle, write_bundle
+from src.model_search import DATASET_PATH, training_split
+from src.train_model import SHIPPED_PRUNING, save_model
+
+PRUNING_LEVELS = {
+    "chi2": [4000, 3000, 2000, 1000, 500, 250],
+    "mutual_info": [4000, 3000, 2000, 1000, 500, 250],
+    "min_df": [2, 3, 5],
+    "max_features": [4000, 3000, 2000, 1000, 500],
+}
+THROUGHPUT_MESSAGES = 20_000  # hold-out messages are repeated up to this many per timing
+VALIDATION_SIZE = 0.2  # share of the training split used to pick a level
+
+
+def presence_mutual_info(X, y):
+    """Mutual information between each term's presence and the label."""
+    return mutual_info_classif(X > 0, y, discrete_features=True, random_state=0)
+
+
+SELECTORS = {"chi2": lambda X, y: chi2(X, y)[0], "mutual_info": presence_mutual_info}
+
+
+# -------------------------------
+# Fitting one pruning level
+# -------------------------------
+def pruning_name(method=None, level=None):
+    """Label of a pruning level, e.g. "min_df=2"; "full" for the full vocabulary."""
+    if method in (None, "full"):
+        return "full"
+    return f"{method}={level}"
+
+
+def vectorizer_for(method=None, level=None, vocabulary=None):
+    """The production TfidfVectorizer, with min_df / max_features / a fixed vocabulary."""
+    params = {"stop_words": "english"}
+    if method in ("min_df", "max_features"):
+        params[method] = level
+    return TfidfVectorizer(vocabulary=vocabulary, **params)
+
+
+def fit_level(texts, labels, method=None, level=None, scores=None, terms=None):
+    """
+    (vectorizer, model) trained at one pruning level; no method means the
+    full vocabulary. Selection methods keep the `level` terms ranked highest
+    by `scores` (aligned with the full vocabulary's `terms`).
+    """
+    vocabulary = None
+    if method in SELECTORS:
+        keep = np.sort(np.argsort(-scores, kind="stable")[:level])
+        vocabulary = terms[keep].tolist()
+    vectorizer = vectorizer_for(method, level, vocabulary)
+    model = MultinomialNB().fit(vectorizer.fit_transform(texts), labels)
+    return vectorizer, model
+
+
+def fit_levels(texts, labels, levels):
+    """
+    Yields (vectorizer, model) for each (method, level) in `levels`, trained
+    on `texts`; selection scores are computed once per method.
+    """
+    full = vectorizer_for()
+    X_full = full.fit_transform(texts)
+    terms = full.get_feature_names_out()
+    scores = {}
+    for method, level in levels:
+        if method in SELECTORS and method not in scores:
+            start = time.perf_counter()
+            scores[method] = SELECTORS[method](X_full, labels)
+            print(f"🧮 {method} scores for {len(terms)} terms in {time.perf_counter() - start:.1f}s")
+        yield fit_level(texts, labels, None if method == "full" else method,
+                        level, scores.get(method), terms)
+
+
+def fit_pruned(texts, labels, method=None, level=None):
+    """(vectorizer, model) trained at one pruning level, e.g. SHIPPED_PRUNING."""
+    return next(fit_levels(texts, labels, [(method or "full", level)]))
+
+
+# -------------------------------
+# Measurements
+# -------------------------------
+def _best_seconds(func, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def measure(vectorizer, model, raw_test, texts_test, y_test):
+    """Size, load time, throughput and hold-out metrics of one trained level."""
+    scorer = LinearScorer.from_sklearn(model, vectorizer, preprocess=DEFAULT_PREPROCESS)
+    pickled = [pickle.dumps(vectorizer), pickle.dumps(model)]
+
+    # Bundle load = manifest + checksummed arrays + vocabulary lookup table
+    with tempfile.TemporaryDirectory() as root:
+        version = write_bundle(scorer, root)
+        bundle_kb = sum(os.path.getsize(os.path.join(root, version, name))
+                        for name in os.listdir(os.path.join(root, version))) / 1024
+        bundle_load = _best_seconds(lambda: load_bundle(root).scorer().vocabulary)
+
+    repeat = max(1, THROUGHPUT_MESSAGES // len(texts_test))
+    texts_many, raw_many = list(texts_test) * repeat, list(raw_test) * repeat
+    y_pred = model.predict(vectorizer.transform(texts_test))
+    return {
+        "n_terms": len(vectorizer.vocabulary_),
+        "pickle_kb": sum(map(len, pickled)) / 1024,
+        "bundle_kb": bundle_kb,
+        "pickle_load_ms": _best_seconds(lambda: [pickle.loads(p) for p in pickled]) * 1e3,
+        "bundle_load_ms": bundle_load * 1e3,
+        "transform_msgs_s": len(texts_many) / _best_seconds(lambda: vectorizer.transform(texts_many)),
+        "scorer_msgs_s": len(raw_many) / _best_seconds(lambda: scorer.score_batch(raw_many)),
+        "accuracy": accuracy_score(y_test, y_pred),
+        "precision": precision_score(y_test, y_pred, zero_division=0),
+        "recall": recall_score(y_test, y_pred),
+    }
+
+
+# -------------------------------
+# Report
+# -------------------------------
+def run_pruning(raw_train, y_train, raw_test, y_test, methods=tuple(PRUNING_LEVELS)):
+    """
+    (report, fitted): one report row per pruning level, full vocabulary
+    first, and the (vectorizer, model) trained on the full training split
+    for each row. `meets_baseline` marks levels with the full model's
+    precision and recall on a validation split of the training data
+    (val_* columns); the other metrics are on the hold-out.
+    """
+    texts_train, texts_test = clean_texts(raw_train), clean_texts(raw_test)
+    y_train, y_test = np.asarray(y_train), np.asarray(y_test)
+
+    n_terms = len(vectorizer_for().fit(texts_train).vocabulary_)
+    levels = [("full", None)] + [(m, k) for m in methods for k in PRUNING_LEVELS[m]
+                                 if not (m in SELECTORS and k >= n_terms)]
+
+    # Choose on a validation split, so the hold-out stays an unbiased report
+    texts_fit, texts_val, y_fit, y_val = train_test_split(
+        texts_train, y_train, test_size=VALIDATION_SIZE, random_state=42, stratify=y_train
+    )
+    validation = []
+    for vectorizer, model in fit_levels(texts_fit, y_fit, levels):
+        y_pred = model.predict(vectorizer.transform(texts_val))
+        validation.append({"val_precision": precision_score(y_val, y_pred, zero_division=0),
+                           "val_recall": recall_score(y_val, y_pred)})
+
+    rows, fitted = [], []
+    for (method, level), val, (vectorizer, model) in zip(
+        levels, validation, fit_levels(texts_train, y_train, levels)
+    ):
+        rows.append({"method": method, "level": level, **val,
+                     **measure(vectorizer, model, raw_test, texts_test, y_test)})
+        fitted.append((vectorizer, model))
+
+    report = pd.DataFrame(rows)
+    baseline = report.iloc[0]
+    report["meets_baseline"] = ((report["val_precision"] >= baseline["val_precision"])
+                                & (report["val_recall"] >= baseline["val_recall"]))
+    report["shipped"] = [pruning_name(m, k) == pruning_name(*SHIPPED_PRUNING) for m, k in levels]
+    report["level"] = report["level"].astype("Int64")
+    return report, fitted
+
+
+def smallest_matching(report):
+    """Row of the smallest model (pickles + bundle on disk) that meets the baseline."""
+    candidates = report[report["meets_baseline"]]
+    size = candidates["pickle_kb"] + candidates["bundle_kb"]
+    return candidates.loc[size.sort_values(kind="stable").index[0]]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python src/train_model.py --prune",
+        description="Size / speed / accuracy report for vocabulary pruning levels.",
+    )
+    parser.add_argument("--methods", nargs="+", choices=list(PRUNING_LEVELS),
+                        default=list(PRUNING_LEVELS))
+    parser.add_argument("-o", "--output", default="pruning_report.csv",
+                        help="report CSV (default: %(default)s)")
+    parser.add_argument("--publish", action="store_true",
+                        help="save the smallest model meeting the baseline as the current model")
+    args = parser.parse_args(argv)
+
+    raw_train, raw_test, y_train, y_test = training_split()
+    raw_train, raw_test = raw_train.tolist(), raw_test.tolist()
+    report, fitted = run_pruning(raw_train, y_train, raw_test, y_test, methods=args.methods)
+    report.to_csv(args.output, index=False)
+
+    with pd.option_context("display.width", 200, "display.max_columns", None,
+                           "display.float_format", "{:.4f}".format):
+        print("\n📊 Pruning report (val_* = validation split used to choose, "
+              "the rest = hold-out):\n")
+        print(report.to_string(index=False))
+    print(f"\n💾 Report written to {args.output}")
+
+    best = smallest_matching(report)
+    name = pruning_name(best["method"], None if pd.isna(best["level"]) else best["level"])
+    print(f"\n🏆 Smallest model matching the full vocabulary ({report.iloc[0]['n_terms']} terms): "
+          f"{name} with {best['n_terms']} terms, hold-out precision {best['precision']:.4f}, "
+          f"recall {best['recall']:.4f}")
+    if name != pruning_name(*SHIPPED_PRUNING):
+        print(f"ℹ️ train_model.py ships {pruning_name(*SHIPPED_PRUNING)}; update SHIPPED_PRUNING "
+              f"if you publish {name}, so retraining keeps it.")
+
+    if args.publish:
+        vectorizer, model = fitted[best.name]
+        metrics = {
+            "accuracy": float(best["accuracy"]),
+            "spam_precision": float(best["precision"]),
+            "spam_recall": float(best["recall"]),
+            "test_size": len(raw_test),
+            "pruning": name,
+        }
+        save_model(model, vectorizer, metrics, DATASET_PATH)
+    return report
+
+
+if __name__ == "__main__":
+    main()